@@ -1,5 +1,11 @@
 import atexit
+import importlib.util
+import mmap
 import os
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
 
 import matplotlib
 import matplotlib.animation as animation
@@ -9,7 +15,23 @@ from matplotlib.patches import FancyBboxPatch
 
 import robot.constants as const
 
-matplotlib.use("TkAgg")
+
+def select_backend():
+    """
+    Select the matplotlib backend: the one set in the MPL_BACKEND environment variable if given,
+    otherwise QtAgg if PyQt is installed, as it animates faster than TkAgg, and TkAgg if not.
+    """
+    backend = os.environ.get("MPL_BACKEND")
+    if backend:
+        return backend
+
+    if importlib.util.find_spec("PyQt6") or importlib.util.find_spec("PyQt5"):
+        return "QtAgg"
+
+    return "TkAgg"
+
+
+matplotlib.use(select_backend())
 
 
 def delete_file(file):
@@ -19,6 +41,64 @@ def delete_file(file):
         print(file)
 
 
+def read_last_line(file):
+    """
+    Read the last line of a file, memory-mapping it instead of reading the whole file.
+
+    :return: The last line without the trailing newline, or None if the file is empty.
+    """
+    with open(file, "rb") as f:
+        # An empty file cannot be memory-mapped.
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Ignore the trailing newline, if any. If there is only one line, rfind returns -1 and the
+            # line starts from the beginning of the file.
+            end = mm.size()
+            if mm[end - 1 : end] == b"\n":
+                end -= 1
+            start = mm.rfind(b"\n", 0, end) + 1
+
+            return mm[start:end].decode()
+
+
+def parse_point(line):
+    """
+    Parse a point of application written as "[x, y]".
+
+    :return: The point as a pair (x, y).
+    :raises ValueError: If the line does not contain a complete point, e.g., if it is only partially written.
+    """
+    start = line.index("[")
+    end = line.index("]", start)
+    x_str, y_str = line[start + 1 : end].split(", ", 1)
+
+    return float(x_str), float(y_str)
+
+
+def attach_shared_memory(name):
+    """
+    Attach to an existing shared memory block without taking ownership of it.
+
+    :return: The shared memory block, or None if it does not exist (yet).
+    """
+    try:
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name=name, track=False)
+
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return None
+
+    # Before Python 3.13, attaching to a block also registers it with the resource tracker on POSIX, which
+    # unlinks the block when this process exits, removing it from under the producer (bpo-39959).
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+    return shm
+
+
 class PointOfApp:
 
     def __init__(self):
@@ -31,37 +111,149 @@ class PointOfApp:
         self.ax.add_patch(self.square)
         self.ax.set_xlim(-12, 12)
         self.ax.set_ylim(-12, 12)
-        (self.point,) = self.ax.plot(0, 0, "ro", markersize=10)
+        # The point is the only moving artist; it is redrawn over the cached background via blitting.
+        (self.point,) = self.ax.plot(0, 0, "ro", markersize=10, animated=True)
+
+        # Length-1 buffers for the point coordinates, updated in place on each frame.
+        self._xs = np.zeros(1)
+        self._ys = np.zeros(1)
+        self.point.set_data(self._xs, self._ys)
+
+        # Attach to the shared memory block holding the latest point, if the producer has created it;
+        # otherwise, fall back to reading the latest point from the temporary file until the block appears
+        # (see _read_file_loop).
+        self._shm = None
+        self._xy_buffers = None
+        self._attach_shared_memory()
+
+        # Modification time and size of the temporary file when it was last read; used to skip
+        # reading the file when nothing new has been written.
+        self._last_mtime = None
+        self._last_size = None
+
+        # Latest point read from the temporary file. The file is read in a background thread, so
+        # that the GUI thread does not block on file I/O; the thread only publishes the latest point.
+        #
+        # The point is published as an immutable tuple; replacing the reference is atomic, so neither
+        # side needs a lock, and reading it in animate is a single attribute load.
+        self._latest_point = (0.0, 0.0)
+
+        # Set when the figure is closed; stops the reader thread from attaching to the shared memory afterwards.
+        self._closed = False
+        if self._xy_buffers is None:
+            self._reader = threading.Thread(target=self._read_file_loop, daemon=True)
+            self._reader.start()
 
-        animation.FuncAnimation(self.fig, self.animate, fargs=(), interval=1)
+        # Keep a reference to the animation; otherwise it is garbage collected and stops updating.
+        self._anim = animation.FuncAnimation(
+            self.fig,
+            self.animate,
+            fargs=(),
+            interval=const.POA_REFRESH_INTERVAL,
+            blit=True,
+        )
+        self.fig.canvas.mpl_connect("close_event", self._on_close)
         plt.show()
 
         atexit.register(delete_file, const.TEMP_FILE)
 
+    def _attach_shared_memory(self):
+        """
+        Attach to the shared memory block holding the latest point as two float64 values (x, y).
+
+        :return: True if attached, False if the block does not exist (yet).
+        """
+        shm = attach_shared_memory(const.POA_SHARED_MEMORY_NAME)
+        if shm is None:
+            return False
+
+        xy = np.ndarray((2,), dtype=np.float64, buffer=shm.buf)
+
+        # Keep a reference to the block, as the views are only valid while it is open. Publish the views of
+        # the shared memory, used as the coordinate buffers, with a single assignment, as the reader thread
+        # may attach while animate runs.
+        self._shm = shm
+        self._xy_buffers = (xy[0:1], xy[1:2])
+
+        return True
+
+    def _read_file_loop(self):
+        read_failed = False
+        while not self._closed:
+            # Switch to the shared memory as soon as the producer has created it.
+            if self._attach_shared_memory():
+                return
+
+            try:
+                point = self._read_last_point()
+                read_failed = False
+            except (OSError, ValueError) as e:
+                # The file may be replaced, truncated, or partially written while it is being read; forget the
+                # modification time and size, so that the file is read again on the next poll. Only report the
+                # first failure, as the file is polled on each frame.
+                if not read_failed:
+                    print("Could not read the point of application: {}".format(e))
+                read_failed = True
+
+                self._last_mtime = None
+                self._last_size = None
+                point = None
+
+            if point is not None:
+                self._latest_point = point
+
+            time.sleep(const.POA_REFRESH_INTERVAL / 1000)
+
+    def _read_last_point(self):
+        """
+        Read the latest point from the temporary file.
+
+        :return: The point as a pair (x, y), or None if there is no new point.
+        """
+        # A single stat call both checks that the file exists and gives its size and modification time.
+        try:
+            st = os.stat(const.TEMP_FILE)
+        except FileNotFoundError:
+            return None
+
+        if (st.st_mtime_ns, st.st_size) == (self._last_mtime, self._last_size):
+            return None
+
+        self._last_mtime = st.st_mtime_ns
+        self._last_size = st.st_size
+
+        line = read_last_line(const.TEMP_FILE)
+        if line is None:
+            return None
+
+        return parse_point(line)
+
+    def _on_close(self, event):
+        self._closed = True
+
+        if self._shm is None:
+            return
+
+        # Drop the views of the shared memory first; the block cannot be closed while they exist. The
+        # producer owns the block, hence it is only closed here, not unlinked.
+        self._xy_buffers = None
+        self._shm.close()
+        self._shm = None
+
     def animate(self, i):
         """
         Loop to read live sensor data and perform relevant operations.
 
         """
-        if os.path.exists(const.TEMP_FILE) and os.path.getsize(const.TEMP_FILE) > 0:
-            with open(const.TEMP_FILE, "rb") as file:
-                try:  # catch OSError in case of a one line file
-                    file.seek(-2, os.SEEK_END)
-                    while file.read(1) != b"\n":
-                        file.seek(-2, os.SEEK_CUR)
-                except OSError:
-                    file.seek(0)
-                data = file.readline().decode()
-
-            data = data[data.find("[") + 1 : data.find("]")]
-            data = np.array(data.split(", "), dtype="float64")
-
-            self.point.set_data(data[0], data[1])
-
-            # Redraw the plot
-            self.fig.canvas.draw()
+        xy_buffers = self._xy_buffers
+        if xy_buffers is None:
+            self._xs[0], self._ys[0] = self._latest_point
+            self.point.set_data(self._xs, self._ys)
         else:
-            pass
+            self.point.set_data(*xy_buffers)
+
+        # Return the updated artists for blitting.
+        return (self.point,)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import logging
 import os
 import sys
 import time
@@ -9,6 +10,7 @@ import socketio
 from dotenv import load_dotenv
 
 import robot.constants as const
+import robot.json_serializer as json_serializer
 from robot.control.color import Color
 from robot.control.robot_control import RobotControl, RobotObjective
 
@@ -18,7 +20,7 @@ class RemoteControl:
         self.__buffer = []
         self.__remote_host = remote_host
         self.__connected = False
-        self.__sio = socketio.Client()
+        self.__sio = socketio.Client(json=json_serializer)
 
         self.__sio.on("connect", self.__on_connect)
         self.__sio.on("disconnect", self.__on_disconnect)
@@ -36,7 +38,11 @@ class RemoteControl:
 
     def __on_message_receive(self, msg):
         self.__lock.acquire()
-        self.__buffer.append(msg)
+        # The relay server coalesces messages arriving close to each other into a list.
+        if isinstance(msg, list):
+            self.__buffer.extend(msg)
+        else:
+            self.__buffer.append(msg)
         self.__lock.release()
 
     def __on_restart_main_loop(self):
@@ -59,7 +65,9 @@ class RemoteControl:
         return res
 
     def connect(self):
-        self.__sio.connect(self.__remote_host)
+        # Connect directly over WebSocket, skipping the HTTP long-polling handshake and the
+        # transport upgrade; each message is then a single WebSocket frame.
+        self.__sio.connect(self.__remote_host, transports=["websocket"])
 
         while not self.__connected:
             print("Connecting...")
@@ -203,6 +211,12 @@ def main(connection=None):
 
     # Configure logging.
     np.set_printoptions(formatter={"float": "{:0.1f}".format})
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Only enable debug logging for the robot package; third-party libraries (e.g., python-socketio) log
+    # each packet at the debug level.
+    if config["verbose"]:
+        logging.getLogger("robot").setLevel(logging.DEBUG)
 
     # Initialize robot controller
 
@@ -4,7 +4,11 @@
 # This scripts runs a Socket.IO server that forwards all the messages from
 # the neuronavigation system to the robot. That is, upon receiving a
 # 'from_neuronavigation' message, it emits 'to_robot' message with the same
-# data.
+# data. Messages from neuronavigation arriving close to each other are
+# coalesced, i.e., 'to_robot' carries a list of one or more messages.
+#
+# Forwarded messages are not sent back to the client that sent them: like a
+# publish/subscribe relay, only the peers receive them.
 #
 # Important:
 #      :param data: The data to send to the client or clients. Data can be of
@@ -14,13 +18,15 @@
 #
 
 import asyncio
+import logging
 import sys
 
-import nest_asyncio
 import socketio
 import uvicorn
 
-nest_asyncio.apply()
+import robot.json_serializer as json_serializer
+
+logger = logging.getLogger(__name__)
 
 default_host = "127.0.0.1"
 
@@ -34,27 +40,55 @@ else:
     print(f"Usage: python {sys.argv[0]} [host] port")
     sys.exit(1)
 
-sio = socketio.AsyncServer(async_mode="asgi")
+# Messages from neuronavigation arriving within this time window (in seconds) are forwarded to
+# the robot together, as a single list, instead of one frame per message.
+COALESCE_WINDOW = 0.002
+
+sio = socketio.AsyncServer(async_mode="asgi", json=json_serializer)
 app = socketio.ASGIApp(sio)
 
+pending_to_robot = []
+pending_senders = set()
+
 
 @sio.event
-def from_neuronavigation(sid, msg):
-    asyncio.create_task(sio.emit("to_robot", msg))
-    print("Forwarding neuronavigation -> robot: %s" % str(msg))
+async def from_neuronavigation(sid, msg):
+    global pending_to_robot, pending_senders
+
+    # Lazy formatting: the message is only converted to a string if debug logging is enabled.
+    logger.debug("Forwarding neuronavigation -> robot: %s", msg)
+
+    pending_to_robot.append(msg)
+    pending_senders.add(sid)
+
+    # The handler that receives the first message of a batch waits for the coalescing window and
+    # then forwards the whole batch; the messages arriving meanwhile are forwarded along with it.
+    if len(pending_to_robot) > 1:
+        return
+
+    await asyncio.sleep(COALESCE_WINDOW)
+
+    batch, pending_to_robot = pending_to_robot, []
+    senders, pending_senders = pending_senders, set()
+    await sio.emit("to_robot", batch, skip_sid=list(senders))
 
 
 @sio.event
-def from_robot(sid, msg):
-    asyncio.create_task(sio.emit("to_neuronavigation", msg))
-    print("Forwarding robot -> neuronavigation: %s" % str(msg))
+async def from_robot(sid, msg):
+    await sio.emit("to_neuronavigation", msg, skip_sid=sid)
+    logger.debug("Forwarding robot -> neuronavigation: %s", msg)
 
 
 @sio.event
-def restart_robot_main_loop(sid):
-    asyncio.create_task(sio.emit("restart_robot_main_loop"))
-    print("Restarting robot main_loop")
+async def restart_robot_main_loop(sid):
+    await sio.emit("restart_robot_main_loop", skip_sid=sid)
+    logger.info("Restarting robot main_loop")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=host, port=port, loop="asyncio")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Use uvloop if it is installed (it is not available on Windows), otherwise the default asyncio loop.
+    #
+    # The access log would log every long-polling request, i.e., potentially every forwarded message.
+    uvicorn.run(app, host=host, port=port, loop="auto", access_log=False)
@@ -2,6 +2,12 @@ DISPLAY_POA = True
 
 TEMP_FILE = "tmp"
 
+# Redraw interval of the point of application display (in milliseconds), ~30 Hz.
+POA_REFRESH_INTERVAL = 33
+
+# Name of the shared memory block holding the latest point of application (x, y) as two float64 values.
+POA_SHARED_MEMORY_NAME = "poa_xy"
+
 # Site config
 #
 # rx_offset, ry_offset, rz_offset:
@@ -116,7 +122,9 @@ ROBOT_CONFIG = {
         # Robot working space is defined as 800 mm in Elfin 5 manual. For safety, the value is
         # reduced by 5%. For debugging, feel free to use 1000 mm.
         "working_space_radius": 850,
-        "sleep": 0.0,
+        # The robot state is read from the values cached by ElfinCommThread, so the loop does not block on the
+        # robot; pace it at the polling interval instead of spinning.
+        "sleep": 0.005,
         # Head motion
         "head_velocity_threshold": 60,
         # Tuning motion
@@ -0,0 +1,86 @@
+"""
+Kernel for the Kalman filters used for smoothing the head pose received from the tracker (see KalmanTracker in
+robot_processing.py).
+
+The kernel updates a stack of independent filters with a scalar measurement each in a single call, performing
+the same predict and correct steps as cv2.KalmanFilter. It is compiled with Numba if it is installed (see
+_fast_tf.py), otherwise it runs as plain Python.
+"""
+
+import numpy as np
+
+from robot.control._fast_tf import njit
+
+
+# Compiled eagerly for contiguous float64 arrays, so that the compilation does not happen (or the cached version
+# is not loaded) on the first tick of the control loop.
+@njit(
+    "void(float64[:, ::1], float64[:, :, ::1], float64[::1], float64[:, ::1], float64[:, ::1], float64[::1], float64)",
+    cache=True,
+)
+def kalman_step(x, P, z, F, Q, H, R):
+    """
+    Predict and correct n independent Kalman filters with a d-dimensional state and a scalar measurement, in place.
+
+    For each filter, equivalent to cv2.KalmanFilter.predict followed by cv2.KalmanFilter.correct, without a control
+    input.
+
+    :param x: The states of the filters (n x d); updated in place.
+    :param P: The error covariances of the filters (n x d x d); updated in place.
+    :param z: The measurements, one for each filter (n).
+    :param F: The transition matrix (d x d).
+    :param Q: The process noise covariance (d x d).
+    :param H: The measurement matrix (d).
+    :param R: The measurement noise variance.
+    """
+    n, d = x.shape
+
+    x_pred = np.empty(d)
+    FP = np.empty((d, d))
+    P_pred = np.empty((d, d))
+    PHt = np.empty(d)
+    HP = np.empty(d)
+
+    for f in range(n):
+        # Predict: x_pred = F x, P_pred = F P F^T + Q.
+        for i in range(d):
+            acc = 0.0
+            for j in range(d):
+                acc += F[i, j] * x[f, j]
+            x_pred[i] = acc
+
+        for i in range(d):
+            for j in range(d):
+                acc = 0.0
+                for k in range(d):
+                    acc += F[i, k] * P[f, k, j]
+                FP[i, j] = acc
+
+        for i in range(d):
+            for j in range(d):
+                acc = Q[i, j]
+                for k in range(d):
+                    acc += FP[i, k] * F[j, k]
+                P_pred[i, j] = acc
+
+        # Correct: S = H P_pred H^T + R, K = P_pred H^T / S, x = x_pred + K (z - H x_pred), P = P_pred - K H P_pred.
+        innovation = z[f]
+        S = R
+        for i in range(d):
+            innovation -= H[i] * x_pred[i]
+
+            acc_PHt = 0.0
+            acc_HP = 0.0
+            for j in range(d):
+                acc_PHt += P_pred[i, j] * H[j]
+                acc_HP += H[j] * P_pred[j, i]
+            PHt[i] = acc_PHt
+            HP[i] = acc_HP
+
+            S += H[i] * acc_PHt
+
+        for i in range(d):
+            gain = PHt[i] / S
+            x[f, i] = x_pred[i] + gain * innovation
+            for j in range(d):
+                P[f, i, j] = P_pred[i, j] - gain * HP[j]
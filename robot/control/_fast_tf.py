@@ -0,0 +1,151 @@
+"""
+Kernels for building the 4x4 transformation matrices used on each tick of the control loop, and for
+the loops of the tracker-to-robot matrix estimation (see Transformation_matrix in robot_processing.py).
+
+The kernels are equivalent to the corresponding compositions of functions in transformations.py
+(euler_matrix, translation_matrix, and multiply_matrices), but they are specialized to the axis
+sequences used here and build the matrix directly with explicit sine and cosine arithmetic. They are
+compiled with Numba if it is installed, otherwise they run as plain Python.
+
+All angles are in radians.
+"""
+
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+
+    def njit(*args, **kwargs):
+        # Numba is not installed; return the function unchanged.
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+@njit(cache=True)
+def _set_euler_rotation(M, ai, aj, ak, i, j, k):
+    """
+    Write the rotation for a non-repeating axis sequence into the upper-left 3x3 block of M.
+
+    Corresponds to the 'repetition = 0' branch of euler_matrix in transformations.py, after the
+    frame and parity adjustments have been applied to the angles and axes.
+    """
+    si, sj, sk = math.sin(ai), math.sin(aj), math.sin(ak)
+    ci, cj, ck = math.cos(ai), math.cos(aj), math.cos(ak)
+    cc, cs = ci * ck, ci * sk
+    sc, ss = si * ck, si * sk
+
+    M[i, i] = cj * ck
+    M[i, j] = sj * sc - cs
+    M[i, k] = sj * cc + ss
+    M[j, i] = cj * sk
+    M[j, j] = sj * ss + cc
+    M[j, k] = sj * cs - sc
+    M[k, i] = -sj
+    M[k, j] = cj * si
+    M[k, k] = cj * ci
+
+
+@njit(cache=True)
+def euler_to_mat_sxyz(a, b, g):
+    """Equivalent to euler_matrix(a, b, g, axes='sxyz')."""
+    M = np.identity(4)
+    _set_euler_rotation(M, a, b, g, 0, 1, 2)
+    return M
+
+
+@njit(cache=True)
+def euler_to_mat_rxyz(a, b, g):
+    """Equivalent to euler_matrix(a, b, g, axes='rxyz')."""
+    M = np.identity(4)
+    # 'rxyz' uses a rotating frame (swapping the first and last angle) with odd parity (negating
+    # the angles), and the axes in the order z, y, x.
+    _set_euler_rotation(M, -g, -b, -a, 2, 1, 0)
+    return M
+
+
+# The kernels called on each tick are compiled eagerly for contiguous float64 vectors only. float32 is not
+# used, as the 4x4 matrices are tiny (the cost is in call overhead, not in moving bytes) and the Euler
+# angle extraction in transformations.py relies on float64 precision; the explicit signature ensures that
+# a single specialization exists and that inputs of another type fail instead of triggering recompilation.
+_POSE_KERNEL_SIGNATURE = "float64[:, ::1](float64[::1], float64[::1])"
+
+
+@njit(_POSE_KERNEL_SIGNATURE, cache=True)
+def compose_trans_then_rot(pos, euler):
+    """
+    Equivalent to multiply_matrices(translation_matrix(pos), euler_matrix(*euler, axes='sxyz')),
+    i.e., coordinates_to_transformation_matrix with the Euler angles in radians.
+    """
+    M = euler_to_mat_sxyz(euler[0], euler[1], euler[2])
+    M[0, 3] = pos[0]
+    M[1, 3] = pos[1]
+    M[2, 3] = pos[2]
+    return M
+
+
+@njit(_POSE_KERNEL_SIGNATURE, cache=True)
+def compose_rot_then_trans(pos, euler):
+    """
+    Equivalent to multiply_matrices(euler_matrix(*euler, axes='rxyz'), translation_matrix(pos)),
+    i.e., first rotate, then translate, as in the displacement received from neuronavigation.
+    """
+    # The rotation has no translation, so the product is [R, R @ pos; 0, 1]: compute only the
+    # translation column instead of a full 4x4 product.
+    M = euler_to_mat_rxyz(euler[0], euler[1], euler[2])
+    for row in range(3):
+        M[row, 3] = M[row, 0] * pos[0] + M[row, 1] * pos[1] + M[row, 2] * pos[2]
+    return M
+
+
+@njit(cache=True)
+def sum_rotation_kron(A, B, n_terms):
+    """
+    Equivalent to the sum of np.kron(B[0:3, 0:3, ii], A[0:3, 0:3, ii]) over ii in range(n_terms).
+
+    :param A: A stack of 4x4 transformation matrices (4x4xn).
+    :param B: A stack of 4x4 transformation matrices (4x4xn).
+    :return: The sum (9x9).
+    """
+    T = np.zeros((9, 9))
+    for ii in range(n_terms):
+        for p in range(3):
+            for q in range(3):
+                rb = B[p, q, ii]
+                for r in range(3):
+                    for s in range(3):
+                        T[3 * p + r, 3 * q + s] += rb * A[r, s, ii]
+    return T
+
+
+@njit(cache=True)
+def build_translation_system(A, B, Y, n_terms):
+    """
+    Build the linear system A_est @ t = b_est for the translations of X and Y in AX = YB.
+
+    For each ii in range(n_terms), the rows 3 * ii ... 3 * ii + 2 are [-Ra, I] in A_est and ta - Y @ tb in
+    b_est, where Ra and ta are the rotation and translation of A[:, :, ii], and tb is the translation of
+    B[:, :, ii]. The remaining rows are zero.
+
+    :return: A_est (3n x 6) and b_est (3n x 1).
+    """
+    n = A.shape[2]
+    A_est = np.zeros((3 * n, 6))
+    b_est = np.zeros((3 * n, 1))
+    for ii in range(n_terms):
+        for r in range(3):
+            row = 3 * ii + r
+            for c in range(3):
+                A_est[row, c] = -A[r, c, ii]
+            A_est[row, 3 + r] = 1.0
+
+            b_est[row, 0] = (
+                A[r, 3, ii]
+                - Y[r, 0] * B[0, 3, ii]
+                - Y[r, 1] * B[1, 3, ii]
+                - Y[r, 2] * B[2, 3, ii]
+            )
+    return A_est, b_est
@@ -112,7 +112,7 @@ class DirectlyPIDAlgorithm:
         actual_pose_z = pose[2]
         pose[2] = self.config["safe_height"]
         # If a target pose is provided, modify Z pose for orientation
-        if target_pose_in_robot_space:
+        if target_pose_in_robot_space is not None:
             pose[3] = target_pose_in_robot_space[3]
             pose[4] = target_pose_in_robot_space[4]
             pose[5] = target_pose_in_robot_space[5]
@@ -120,7 +120,7 @@ class DirectlyPIDAlgorithm:
 
         # Transition to the next state if needed
         if (
-            target_pose_in_robot_space
+            target_pose_in_robot_space is not None
             and success
             and (round(actual_pose_z) >= round(self.config["safe_height"]))
         ):
@@ -11,11 +11,18 @@ class RobotPoseStorage:
     """
 
     def __init__(self):
-        self.robot_pose = [None] * 6
+        # The pose is always stored as a float64 array of [x, y, z, rx, ry, rz]; NaN means that the pose
+        # has not been received yet.
+        self.robot_pose = np.full(6, np.nan)
+
+        # Incremented whenever the pose is set; allows callers to cache values computed from the pose.
+        self.version = 0
 
     def SetRobotPose(self, robot_pose):
-        robot_pose = np.array(robot_pose)
+        # Store a new array instead of writing into the old one, as the callers may still hold the previous pose.
+        robot_pose = np.array(robot_pose, dtype=np.float64)
         self.robot_pose = robot_pose
+        self.version += 1
 
     def GetRobotPose(self):
         return self.robot_pose
@@ -32,15 +39,33 @@ class Tracker:
         self.poses = [None, None, None]
         self.m_tracker_to_robot = None
 
+        # The inverse of X in m_tracker_to_robot; computed once when the matrix is set, not on each transformation.
+        self.m_tracker_to_robot_X_inverse = None
+
+        # Preallocated buffers for the matrix products in transform_matrix_to_robot_space, which is called on each
+        # tick of the control loop. Their contents are only valid until the next call.
+        self._m_product_buffer = np.empty((4, 4))
+        self._m_in_robot_space_buffer = np.empty((4, 4))
+        self._m_affine_in_robot_space_buffer = np.empty((4, 4))
+
         self.probe_visible = False
         self.head_visible = False
         self.coil_visible = False
 
         self.head_pose = None
 
+        # Incremented whenever the coordinates are set; allows callers to tell a new sample from the previous one.
+        self.version = 0
+
     def SetTrackerToRobotMatrix(self, m_tracker_to_robot):
         self.m_tracker_to_robot = m_tracker_to_robot
 
+        if m_tracker_to_robot is not None:
+            X, _, _ = m_tracker_to_robot
+            self.m_tracker_to_robot_X_inverse = tr.inverse_matrix(X)
+        else:
+            self.m_tracker_to_robot_X_inverse = None
+
     def SetCoordinates(self, poses, visibilities):
         self.poses = poses
 
@@ -59,14 +84,24 @@ class Tracker:
         self.head_pose[3], self.head_pose[5] = self.head_pose[5], self.head_pose[3]
         self.coil_pose[3], self.coil_pose[5] = self.coil_pose[5], self.coil_pose[3]
 
+        self.version += 1
+
     def get_head_pose(self):
         return self.head_pose
 
     def transform_matrix_to_robot_space(self, M):
-        X, Y, affine = self.m_tracker_to_robot
-
-        M_in_robot_space = Y @ M @ tr.inverse_matrix(X)
-        M_affine_in_robot_space = affine @ M
+        _, Y, affine = self.m_tracker_to_robot
+
+        # Write the products into the preallocated buffers; the matrices are only used for extracting the
+        # coordinates below, which copies them out.
+        M_in_robot_space = np.matmul(
+            np.matmul(Y, M, out=self._m_product_buffer),
+            self.m_tracker_to_robot_X_inverse,
+            out=self._m_in_robot_space_buffer,
+        )
+        M_affine_in_robot_space = np.matmul(
+            affine, M, out=self._m_affine_in_robot_space_buffer
+        )
 
         _, angles_as_deg = robot_process.transformation_matrix_to_coordinates(
             M_in_robot_space, axes="sxyz"
@@ -1,9 +1,13 @@
+import logging
+import math
 import time
+from collections import deque
 from enum import Enum
 
 import numpy as np
 from pynput import keyboard
 
+import robot.control._fast_tf as fast_tf
 import robot.control.coordinates as coordinates
 import robot.control.robot_processing as robot_process
 import robot.robots.dobot.dobot as dobot
@@ -19,6 +23,15 @@ from robot.control.robot_state_controller import RobotState, RobotStateControlle
 from robot.sensors.force_and_torque_sensor import BufferedForceTorqueSensor
 from robot.sensors.pressure_sensor import BufferedPressureSensorReader
 
+logger = logging.getLogger(__name__)
+
+# All timestamps in this module are only used for computing time differences; use the monotonic clock, which does
+# not jump when the system time is adjusted. Bound once at module level to avoid the attribute lookup on each call.
+_now = time.monotonic
+
+# The states in which the robot is moving or has been commanded to move.
+_MOVING_STATES = frozenset((RobotState.MOVING, RobotState.START_MOVING))
+
 
 class RobotObjective(Enum):
     NONE = 0
@@ -26,7 +39,35 @@ class RobotObjective(Enum):
     MOVE_AWAY_FROM_HEAD = 2
 
 
+# Module-level aliases for the objectives and robot states compared against on each tick; avoids the attribute lookups
+# on the enum classes, as in robot_state_controller.py.
+_OBJECTIVE_NONE = RobotObjective.NONE
+_OBJECTIVE_TRACK_TARGET = RobotObjective.TRACK_TARGET
+_OBJECTIVE_MOVE_AWAY_FROM_HEAD = RobotObjective.MOVE_AWAY_FROM_HEAD
+
+_READY = RobotState.READY
+_MOVING = RobotState.MOVING
+
+
 class RobotControl:
+    # Topics of the messages sent to neuronavigation.
+    TOPIC_CALIBRATION_POINT_COLLECTED = (
+        "Robot to Neuronavigation: Coordinates for the robot transformation matrix "
+        "collected"
+    )
+    TOPIC_UPDATE_TRANSFORMATION_MATRIX = (
+        "Robot to Neuronavigation: Update robot transformation matrix"
+    )
+    TOPIC_CONNECTION_STATUS = "Robot to Neuronavigation: Robot connection status"
+    TOPIC_CLOSE_ROBOT_DIALOG = "Robot to Neuronavigation: Close robot dialog"
+    TOPIC_UPDATE_WARNING = "Robot to Neuronavigation: Update robot warning"
+    TOPIC_FORCE_SENSOR_DATA = "Robot to Neuronavigation: Send force sensor data"
+    TOPIC_UPDATE_Z_OFFSET = "Robot to Neuronavigation: Update z_offset target"
+    TOPIC_SET_OBJECTIVE = "Robot to Neuronavigation: Set objective"
+
+    # Virtual-key codes of the keys handled in on_keypress (F2 and F12) on Windows; see _win32_key_filter.
+    _WATCHED_VK_CODES = frozenset((0x71, 0x7B))
+
     def __init__(self, remote_control, config, site_config, robot_config, connection):
         self.remote_control = remote_control
         self.config = config
@@ -39,6 +80,19 @@ class RobotControl:
 
         self.verbose = config["verbose"]
 
+        # The rotation aligning the coil with the robot end effector (see on_coil_to_robot_alignment); the offsets
+        # are fixed for the site, hence compute the rotation and its inverse only once.
+        self.rotation_alignment_matrix = self.compute_rotation_alignment_matrix()
+        self.rotation_alignment_matrix_inv = np.linalg.inv(
+            self.rotation_alignment_matrix
+        )
+        # If all offsets are zero, the alignment does not change the displacement, and it can be skipped.
+        self._alignment_is_identity = (
+            self.site_config["rx_offset"] == 0
+            and self.site_config["ry_offset"] == 0
+            and self.site_config["rz_offset"] == 0
+        )
+
         self.process_tracker = robot_process.TrackerProcessing(
             robot_config=robot_config,
         )
@@ -48,27 +102,58 @@ class RobotControl:
         self.robot_state_controller = None
 
         self.robot_pose_storage = coordinates.RobotPoseStorage()
+        # The robot pose as a transformation matrix, and the version of the pose it was computed from.
+        self._m_robot = None
+        self._m_robot_version = None
         self.tracker = coordinates.Tracker()
+        # The filtered head pose, and the version of the tracker coordinates it was computed from; see
+        # update_state_variables. Set if the current tick has a new tracker sample.
+        self._head_pose_filtered = None
+        self._tracker_version = None
+        self._new_tracker_sample = False
 
         self.robot = None
 
-        self.tracker_coordinates = []
-        self.robot_coordinates = []
+        # Positions of the coil and the robot at the calibration points, stored in arrays that grow by doubling as
+        # points are added; the first n_calibration_points rows are in use.
+        self.tracker_coordinates = np.empty((8, 3))
+        self.robot_coordinates = np.empty((8, 3))
+        self.n_calibration_points = 0
         self.matrix_tracker_to_robot = []
 
         # reference force and moment values
         self.force_ref = np.array([0.0, 0.0, 0.0])
         self.moment_ref = np.array([0.0, 0.0, 0.0])
 
-        listener = keyboard.Listener(on_press=self.on_keypress)
+        # On Windows, drop all other keys already in the low-level hook, before pynput constructs a key object
+        # and calls on_keypress. (Options prefixed with another platform's name are ignored by pynput.)
+        listener = keyboard.Listener(
+            on_press=self.on_keypress,
+            win32_event_filter=self._win32_key_filter,
+        )
+        # Do not keep the process alive because of the listener thread.
+        listener.daemon = True
         listener.start()
 
         self.target_set = False
         self.m_target_to_head = None
         self.target_reached = False
 
-        self.displacement_to_target = 6 * [0]
-        self.displacement_to_target_history = []
+        # Displacement to the target as [x, y, z, rx, ry, rz]; updated in place when a new displacement is received.
+        # The buffer is always allocated; _have_displacement tells whether it holds a valid, recent displacement.
+        self.displacement_to_target = np.zeros(6)
+        self._have_displacement = False
+        # The latest displacements received from neuronavigation, and the number of consecutive identical
+        # displacements at the end of the history.
+        self.displacement_to_target_history = deque(maxlen=20)
+        self._equal_displacement_run = 0
+
+        # Signs to apply to the displacement received from neuronavigation; see on_update_displacement_to_target.
+        self._sign_flip = np.array([-1, 1, 1, -1, 1, 1], dtype=np.float64)
+
+        # Components of the displacement (all except z) that need to be near the target for the force to be
+        # considered stable; see send_force_stability_to_neuronavigation.
+        self._stability_mask = np.array([True, True, False, True, True, True])
 
         self.use_pressure = self.config["use_pressure_sensor"]
         self.use_force = self.config["use_force_sensor"]
@@ -79,6 +164,16 @@ class RobotControl:
         self.pid_group = PIDControllerGroup(
             use_force=self.use_force, use_pressure=self.use_pressure
         )
+        # The PID controllers are only used by the 'directly PID' movement algorithm; resolve the algorithm once
+        # instead of checking the config on each update.
+        self._use_pid = self.config.get("movement_algorithm") == "directly_PID"
+
+        # The squared radius of the robot's working space, for comparing with the squared distance to the target.
+        self._working_space_radius_sq = self.robot_config["working_space_radius"] ** 2
+
+        # Config values read on each tick of the control loop; they do not change at runtime.
+        self._stop_if_head_not_visible = self.config["stop_robot_if_head_not_visible"]
+        self._tuning_interval = self.config["tuning_interval"]
 
         self.force_sensor = None
         if self.use_pressure:
@@ -87,12 +182,17 @@ class RobotControl:
             )
             # self.pid_z.set_force_setpoint()
 
-        self.robot_coord_matrix_list = np.zeros((4, 4))[np.newaxis]
-        self.coord_coil_matrix_list = np.zeros((4, 4))[np.newaxis]
+        # Lists of 4x4 matrices collected for the robot transformation matrix estimation. They are
+        # stacked into arrays only when the estimation is done.
+        self.robot_coord_matrix_list = []
+        self.coord_coil_matrix_list = []
 
-        self.last_displacement_update_time = time.time()
-        self.last_robot_status_logging_time = time.time()
-        self.last_tuning_time = time.time()
+        self.last_displacement_update_time = _now()
+        self.last_robot_status_logging_time = _now()
+        self.last_tuning_time = _now()
+
+        # The time at the start of the current tick of the control loop; see update.
+        self._tick_now = _now()
 
         self.objective = RobotObjective.NONE
         self.moving_away_from_head = False
@@ -141,7 +241,7 @@ class RobotControl:
         # Reset the state of the movement algorithm to ensure that the next movement starts from a known, well-defined state.
         self.movement_algorithm.reset_state()
 
-        if self.config.get("movement_algorithm") == "directly_PID":
+        if self._use_pid:
             self.pid_group.clear()
 
         print("Target set")
@@ -170,28 +270,26 @@ class RobotControl:
             if self.connection:
                 self.connection.robot_pose_collected(success=True)
             if self.remote_control:
-                topic = "Robot to Neuronavigation: Coordinates for the robot transformation matrix collected"
-                data = {}
-                self.remote_control.send_message(topic, data)
+                self.remote_control.send_message(self.TOPIC_CALIBRATION_POINT_COLLECTED)
 
     def on_reset_robot_matrix(self, data):
-        self.robot_coord_matrix_list = np.zeros((4, 4))[np.newaxis]
-        self.coord_coil_matrix_list = np.zeros((4, 4))[np.newaxis]
-        self.tracker_coordinates = []
-        self.robot_coordinates = []
+        self.robot_coord_matrix_list = []
+        self.coord_coil_matrix_list = []
+        self.n_calibration_points = 0
         self.matrix_tracker_to_robot = []
 
     def on_robot_matrix_estimation(self, data=None):
         try:
+            n = self.n_calibration_points
             affine_matrix_robot_to_tracker = robot_process.AffineTransformation(
-                np.array(self.tracker_coordinates), np.array(self.robot_coordinates)
+                self.tracker_coordinates[:n], self.robot_coordinates[:n]
             )
             affine_matrix_tracker_to_robot = tr.inverse_matrix(
                 affine_matrix_robot_to_tracker
             )
 
-            robot_coordinates = np.stack(self.robot_coord_matrix_list[1:], axis=2)
-            coord_coil_list = np.stack(self.coord_coil_matrix_list[1:], axis=2)
+            robot_coordinates = np.stack(self.robot_coord_matrix_list, axis=2)
+            coord_coil_list = np.stack(self.coord_coil_matrix_list, axis=2)
 
             # Estimating the transformation matrix between the tracker and the robot includes randomness; ensure that the
             # results are reproducible.
@@ -205,41 +303,34 @@ class RobotControl:
             self.matrix_tracker_to_robot = X_est, Y_est, affine_matrix_tracker_to_robot
             self.tracker.SetTrackerToRobotMatrix(self.matrix_tracker_to_robot)
 
+            # The matrices are sent flattened; build the list once for both receivers.
+            payload = (
+                np.concatenate((X_est, Y_est, affine_matrix_tracker_to_robot), axis=0)
+                .ravel()
+                .tolist()
+            )
+
             if self.connection:
-                self.connection.update_robot_transformation_matrix(
-                    np.hstack(
-                        np.concatenate((X_est, Y_est, affine_matrix_tracker_to_robot))
-                    ).tolist()
-                )
+                self.connection.update_robot_transformation_matrix(payload)
             if self.remote_control:
-                topic = "Robot to Neuronavigation: Update robot transformation matrix"
-                data = {
-                    "data": np.hstack(
-                        np.concatenate((X_est, Y_est, affine_matrix_tracker_to_robot))
-                    ).tolist()
-                }
-                self.remote_control.send_message(topic, data)
+                self.remote_control.send_message(
+                    self.TOPIC_UPDATE_TRANSFORMATION_MATRIX, {"data": payload}
+                )
 
         except np.linalg.LinAlgError:
             print("numpy.linalg.LinAlgError")
             print("Try a new acquisition")
 
     def on_set_robot_transformation_matrix(self, data):
-        X_est, Y_est, affine_matrix_tracker_to_robot = np.split(
-            np.array(data["data"]).reshape(12, 4), 3, axis=0
-        )
+        # The matrices are received flattened; reshape them into a stack of three 4x4 matrices and unpack views of it.
+        # The views are only read after this, so they do not need to be copied.
+        X_est, Y_est, affine_matrix_tracker_to_robot = np.asarray(
+            data["data"], dtype=np.float64
+        ).reshape(3, 4, 4)
         self.matrix_tracker_to_robot = X_est, Y_est, affine_matrix_tracker_to_robot
         self.tracker.SetTrackerToRobotMatrix(self.matrix_tracker_to_robot)
 
-    def on_coil_to_robot_alignment(self, displacement):
-        # XXX: Why does the transformation done by this function exist in the first place? The displacement is received
-        #   from neuronavigation in terms of the TCP coordinate system, and it is used to estimate the target position in robot
-        #   space using the current robot pose and the displacement.
-        #
-        #   This function essentially transforms the displacement to the end effector coordinate system. However, it is only needed
-        #   if robot pose was received from the robot in terms of the end effector coordinate system, but at least in case of Elfin
-        #   the robot pose is in terms of TCP coordinate system, making the transformation done here seemingly incorrect (if the
-        #   rx, ry, and rz offsets differ from zero - if they are zero, this transformation does not do anything.)
+    def compute_rotation_alignment_matrix(self):
         xaxis, yaxis, zaxis = [1, 0, 0], [0, 1, 0], [0, 0, 1]
 
         rx_offset = self.site_config["rx_offset"]
@@ -250,7 +341,19 @@ class RobotControl:
         Ry = tr.rotation_matrix(np.radians(ry_offset), yaxis)
         Rz = tr.rotation_matrix(np.radians(rz_offset), zaxis)
 
-        rotation_alignment_matrix = tr.multiply_matrices(Rx, Ry, Rz)
+        return tr.multiply_matrices(Rx, Ry, Rz)
+
+    def on_coil_to_robot_alignment(self, displacement):
+        # XXX: Why does the transformation done by this function exist in the first place? The displacement is received
+        #   from neuronavigation in terms of the TCP coordinate system, and it is used to estimate the target position in robot
+        #   space using the current robot pose and the displacement.
+        #
+        #   This function essentially transforms the displacement to the end effector coordinate system. However, it is only needed
+        #   if robot pose was received from the robot in terms of the end effector coordinate system, but at least in case of Elfin
+        #   the robot pose is in terms of TCP coordinate system, making the transformation done here seemingly incorrect (if the
+        #   rx, ry, and rz offsets differ from zero - if they are zero, this transformation does not do anything.)
+        if self._alignment_is_identity:
+            return displacement[:3], displacement[3:]
 
         m_offset = robot_process.coordinates_to_transformation_matrix(
             position=displacement[:3],
@@ -258,9 +361,9 @@ class RobotControl:
             axes="sxyz",
         )
         displacement_matrix = (
-            np.linalg.inv(rotation_alignment_matrix)
+            self.rotation_alignment_matrix_inv
             @ m_offset
-            @ rotation_alignment_matrix
+            @ self.rotation_alignment_matrix
         )
 
         return robot_process.transformation_matrix_to_coordinates(
@@ -283,7 +386,7 @@ class RobotControl:
         # Reset state of the movement algorithm. This is done because we want to ensure that the movement algorithm starts from a
         # known, well-defined state when the objective changes.
         self.movement_algorithm.reset_state()
-        if self.config.get("movement_algorithm") == "directly_PID":
+        if self._use_pid:
             self.pid_group.clear()
 
         # Send the objective back to neuronavigation. This is a form of acknowledgment; it is used to update the robot-related
@@ -292,15 +395,23 @@ class RobotControl:
 
     def compute_target_in_robot_space(self):
         # If the displacement to the target is not available, return early.
-        if self.displacement_to_target is None:
+        if not self._have_displacement:
             return None
 
+        # If the robot pose has not been received yet, return early.
         robot_pose = self.robot_pose_storage.GetRobotPose()
-        m_robot = robot_process.coordinates_to_transformation_matrix(
-            position=robot_pose[:3],
-            orientation=robot_pose[3:],
-            axes="sxyz",
-        )
+        if not np.isfinite(robot_pose).all():
+            return None
+
+        # The robot pose is updated less often than this is called; recompute the matrix only if the pose has changed.
+        version = self.robot_pose_storage.version
+        if version != self._m_robot_version:
+            # Equivalent to coordinates_to_transformation_matrix(robot_pose[:3], robot_pose[3:], axes="sxyz").
+            self._m_robot = fast_tf.compose_trans_then_rot(
+                robot_pose[:3], np.radians(robot_pose[3:])
+            )
+            self._m_robot_version = version
+        m_robot = self._m_robot
 
         # XXX: The code below essentially copies the code from coordinates_to_transformation_matrix function, except that the order
         #   of rotation and translation is reversed (in the code below it is: rotation first, then translation). However,
@@ -308,23 +419,23 @@ class RobotControl:
         #   using two different conventions. The correct solution would be to change neuronavigation so that the displacement
         #   received from the there follows the same convention as used elsewhere in this code and most likely in neuronavigation
         #   as well.
-        a, b, g = np.radians(self.displacement_to_target[3:])
+        displacement = self.displacement_to_target
 
         # XXX: The order of axis rotations in the displacement received from neuronavigation is: rx, ry, rz in a rotating frame ('rxyz').
         #   Hence, use that when generating the rotation matrix, even though 'sxyz' (equivalent to 'rzyx') is the convention used in the
         #   rest of the code.
-        r_ref = tr.euler_matrix(a, b, g, axes="rxyz")
-        t_ref = tr.translation_matrix(self.displacement_to_target[:3])
-
+        #
         # XXX: First rotate, then translate. This is done because displacement received from neuronavigation uses that order.
-        m_offset = tr.multiply_matrices(r_ref, t_ref)
+        m_offset = fast_tf.compose_rot_then_trans(
+            displacement[:3], np.radians(displacement[3:])
+        )
 
         m_final = m_robot @ m_offset
         translation, angles_as_deg = robot_process.transformation_matrix_to_coordinates(
             m_final, axes="sxyz"
         )
 
-        return list(translation) + list(angles_as_deg)
+        return np.concatenate((translation, angles_as_deg))
 
     def on_update_displacement_to_target(self, data):
         # For the displacement received from the neuronavigation, the following holds:
@@ -349,44 +460,52 @@ class RobotControl:
         # become [-10, 0, 0, 0, 0, 0]. However, the displacement received from neuronavigation is [10, 0, 0, 0, 0, 0].
         # The same applies for rx-axis (but not for the other axes) - hence the sign reversal for x- and rx-axes.
         #
-        displacement[0] = -displacement[0]
-        displacement[3] = -displacement[3]
+        # Multiplying by the sign vector also converts the displacement to an array, producing a fresh copy.
+        displacement = np.asarray(displacement, dtype=np.float64) * self._sign_flip
 
         translation, angles_as_deg = self.on_coil_to_robot_alignment(displacement)
         # Update PID controllers
-        if self.config.get("movement_algorithm") == "directly_PID":
+        if self._use_pid:
             self.pid_group.update_translation(translation, self.force_feedback)
             self.pid_group.update_rotation(angles_as_deg)
             self.z_offset = translation[2]
             translation, angles_as_deg = self.pid_group.get_outputs()
 
-        self.displacement_to_target = list(translation) + list(angles_as_deg)
+        # Write the displacement into the existing buffer.
+        self.displacement_to_target[:3] = translation
+        self.displacement_to_target[3:] = angles_as_deg
+        self._have_displacement = True
 
+        now = _now()
         if self.verbose and self.last_displacement_update_time is not None:
             print(
                 "Displacement received: {} (time since last: {:.2f} s)".format(
-                    ", ".join(
-                        ["{:.2f}".format(x) for x in self.displacement_to_target]
+                    np.array2string(
+                        self.displacement_to_target,
+                        separator=", ",
+                        formatter={"float_kind": "{:.2f}".format},
                     ),
-                    time.time() - self.last_displacement_update_time,
+                    now - self.last_displacement_update_time,
                 )
             )
 
-        self.last_displacement_update_time = time.time()
+        self.last_displacement_update_time = now
 
-        self.displacement_to_target_history.append(displacement.copy())
-        if len(self.displacement_to_target_history) >= 20:
-            if all(
-                x == self.displacement_to_target_history[0]
-                for x in self.displacement_to_target_history
-            ):
-                self.stop_robot()
-                self.objective = RobotObjective.NONE
-                self.send_objective_to_neuronavigation()
-                print(
-                    "ERROR: Same coordinates from Neuronavigator. Please check if the tracker device is connected."
-                )
-            del self.displacement_to_target_history[0]
+        # Keep count of consecutive identical displacements instead of comparing the whole history on each update.
+        history = self.displacement_to_target_history
+        if history and np.array_equal(displacement, history[-1]):
+            self._equal_displacement_run += 1
+        else:
+            self._equal_displacement_run = 1
+        history.append(displacement)
+
+        if self._equal_displacement_run >= history.maxlen:
+            self.stop_robot()
+            self.objective = RobotObjective.NONE
+            self.send_objective_to_neuronavigation()
+            print(
+                "ERROR: Same coordinates from Neuronavigator. Please check if the tracker device is connected."
+            )
 
     def on_coil_at_target(self, data):
         self.target_reached = data["state"]
@@ -396,9 +515,9 @@ class RobotControl:
         self.status_connection = "Trying to connect"
 
         if self.remote_control:
-            topic = "Robot to Neuronavigation: Robot connection status"
-            data = {"data": self.status_connection}
-            self.remote_control.send_message(topic, data)
+            self.remote_control.send_message(
+                self.TOPIC_CONNECTION_STATUS, {"data": self.status_connection}
+            )
 
         robot_type = self.config["robot"]
         print(
@@ -480,9 +599,7 @@ class RobotControl:
 
             # Send message to tms_robot_control to close the robot dialog.
             if self.remote_control:
-                topic = "Robot to Neuronavigation: Close robot dialog"
-                data = {}
-                self.remote_control.send_message(topic, data)
+                self.remote_control.send_message(self.TOPIC_CLOSE_ROBOT_DIALOG)
 
             if self.connection:
                 self.connection.close_robot_dialog(True)
@@ -494,9 +611,9 @@ class RobotControl:
         if self.connection:
             self.connection.robot_connection_status(success)
         if self.remote_control:
-            topic = "Robot to Neuronavigation: Robot connection status"
-            data = {"data": self.status_connection}
-            self.remote_control.send_message(topic, data)
+            self.remote_control.send_message(
+                self.TOPIC_CONNECTION_STATUS, {"data": self.status_connection}
+            )
 
     def sensor_update_target(self, distance, status):
         # TODO: tune coil tilt based on the torque values
@@ -510,25 +627,34 @@ class RobotControl:
         # if self.connection:
         #     self.connection.set_warning(warning)
         if self.remote_control and self.last_warning != "":
-            topic = "Robot to Neuronavigation: Update robot warning"
-            data = {"robot_warning": warning}
-            self.remote_control.send_message(topic, data)
+            self.remote_control.send_message(
+                self.TOPIC_UPDATE_WARNING, {"robot_warning": warning}
+            )
         self.last_warning = warning
 
     def send_force_sensor_data_to_neuronavigation(self, force_feedback):
         # Check if force_feedback is NaN (handles both scalars and arrays)
-        if force_feedback is None or np.isnan(force_feedback).any():
+        if force_feedback is None:
             # print("Warning: force_feedback is None or NaN.")
             return
-        force_feedback = np.round(force_feedback, 2)
+
+        # The pressure sensor reading is a single float; check and round it without going through NumPy.
+        if isinstance(force_feedback, (int, float)):
+            if math.isnan(force_feedback):
+                return
+            force_feedback = round(force_feedback, 2)
+        else:
+            if np.isnan(force_feedback).any():
+                return
+            force_feedback = np.round(force_feedback, 2)
         if (self.use_pressure or self.use_force) and not self.force_sensor.force_changed(force_feedback):
             return
 
         # Send message to neuronavigation with force or pressure for GUI.
         if self.remote_control:
-            topic = "Robot to Neuronavigation: Send force sensor data"
-            data = {"force_feedback": -force_feedback}
-            self.remote_control.send_message(topic, data)
+            self.remote_control.send_message(
+                self.TOPIC_FORCE_SENSOR_DATA, {"force_feedback": -force_feedback}
+            )
         # TODO:
         # if self.connection:
         # self.connection.send_force_sensor(force_feedback)
@@ -539,8 +665,8 @@ class RobotControl:
         """
         # displacement_to_target = [x, y, z, rx, ry, rz]
         # Return early if any components (except Z) are within threshold
-        if self.displacement_to_target is not None:
-            if any(abs(self.displacement_to_target[i]) > 2 for i in [0, 1, 3, 4, 5]):
+        if self._have_displacement:
+            if (np.abs(self.displacement_to_target[self._stability_mask]) > 2).any():
                 return
         z_offset = round(z_offset, 2)
         # Check stability with pressure taking priority over force
@@ -556,18 +682,18 @@ class RobotControl:
                 return  # Exit early if only force is enabled and unstable
 
         if self.remote_control:
-            topic = "Robot to Neuronavigation: Update z_offset target"
-            data = {"z_offset": z_offset}
-            self.remote_control.send_message(topic, data)
+            self.remote_control.send_message(
+                self.TOPIC_UPDATE_Z_OFFSET, {"z_offset": z_offset}
+            )
 
     def send_objective_to_neuronavigation(self):
         # Send message to tms_robot_control indicating the current objective.
         if self.connection:
             self.connection.set_objective(self.objective.value)
         if self.remote_control:
-            topic = "Robot to Neuronavigation: Set objective"
-            data = {"objective": self.objective.value}
-            self.remote_control.send_message(topic, data)
+            self.remote_control.send_message(
+                self.TOPIC_SET_OBJECTIVE, {"objective": self.objective.value}
+            )
 
     def on_keypress(self, key):
         """
@@ -578,42 +704,46 @@ class RobotControl:
             (Only has an effect if the environment variable WAIT_FOR_KEYPRESS_BEFORE_MOVEMENT is set to 'true'.)
           - If 'f12' is pressed, stops the robot and sets the objective to NONE.
         """
-        # Single-char keys (such as 'n') have the attribute 'char', whereas, e.g., the function keys do not.
-        #
-        # Hence, check if 'key' has the attribute 'char' and use it if it does.
-        key_str = (
-            key.char
-            if hasattr(key, "char") and key.char is not None
-            else key.name if hasattr(key, "name") and key.name is not None else None
-        )
-
+        # The listener is global, so this is called on every keystroke. Compare the key by identity: the
+        # special keys are enum members, and hashing a KeyCode for a dict lookup formats its repr.
+        if key is keyboard.Key.f2:
+            self._on_f2()
+        elif key is keyboard.Key.f12:
+            self._on_f12()
+
+    def _win32_key_filter(self, msg, data):
+        # Returning False stops the event from being passed on to on_keypress; other applications still receive it.
+        return data.vkCode in self._WATCHED_VK_CODES
+
+    def _on_f2(self):
         if (
-            key_str == "f2"
-            and self.robot_state_controller is not None
-            and self.config["wait_for_keypress_before_movement"]
+            self.robot_state_controller is None
+            or not self.config["wait_for_keypress_before_movement"]
         ):
-            print("")
-            print(
-                "{}Key 'f2' pressed:{} Initiating next movement...".format(
-                    Color.BOLD, Color.END
-                )
+            return
+
+        print("")
+        print(
+            "{}Key 'f2' pressed:{} Initiating next movement...".format(
+                Color.BOLD, Color.END
             )
-            print("")
-            self.robot_state_controller.keypress_detected()
+        )
+        print("")
+        self.robot_state_controller.keypress_detected()
 
-        elif key_str == "f12":
-            print("")
-            print(
-                "{}Key 'f12' pressed:{} Stopping the robot and setting objective to NONE...".format(
-                    Color.BOLD, Color.END
-                )
+    def _on_f12(self):
+        print("")
+        print(
+            "{}Key 'f12' pressed:{} Stopping the robot and setting objective to NONE...".format(
+                Color.BOLD, Color.END
             )
-            print("")
+        )
+        print("")
 
-            self.stop_robot()
+        self.stop_robot()
 
-            self.objective = RobotObjective.NONE
-            self.send_objective_to_neuronavigation()
+        self.objective = RobotObjective.NONE
+        self.send_objective_to_neuronavigation()
 
     def stop_robot(self):
         success = self.robot.stop_robot()
@@ -637,7 +767,7 @@ class RobotControl:
 
         robot_pose = self.robot_pose_storage.GetRobotPose()
 
-        if coil_visible and not any(coord is None for coord in robot_pose):
+        if coil_visible and np.isfinite(robot_pose).all():
             new_robot_coordinates = robot_process.coordinates_to_transformation_matrix(
                 position=robot_pose[:3],
                 orientation=robot_pose[3:],
@@ -651,15 +781,19 @@ class RobotControl:
                 )
             )
 
-            self.robot_coord_matrix_list = np.vstack(
-                [self.robot_coord_matrix_list.copy(), new_robot_coordinates[np.newaxis]]
-            )
-            self.coord_coil_matrix_list = np.vstack(
-                [self.coord_coil_matrix_list.copy(), new_coord_coil_list[np.newaxis]]
-            )
+            self.robot_coord_matrix_list.append(new_robot_coordinates)
+            self.coord_coil_matrix_list.append(new_coord_coil_list)
 
-            self.tracker_coordinates.append(coil_pose[:3])
-            self.robot_coordinates.append(robot_pose[:3])
+            n = self.n_calibration_points
+            if n == len(self.tracker_coordinates):
+                self.tracker_coordinates = np.resize(
+                    self.tracker_coordinates, (2 * n, 3)
+                )
+                self.robot_coordinates = np.resize(self.robot_coordinates, (2 * n, 3))
+
+            self.tracker_coordinates[n] = coil_pose[:3]
+            self.robot_coordinates[n] = robot_pose[:3]
+            self.n_calibration_points = n + 1
 
             return True
         else:
@@ -690,9 +824,9 @@ class RobotControl:
 
     def on_check_connection_robot(self, data):
 
-        topic = "Robot to Neuronavigation: Robot connection status"
-        data = {"data": self.status_connection}
-        self.remote_control.send_message(topic, data)
+        self.remote_control.send_message(
+            self.TOPIC_CONNECTION_STATUS, {"data": self.status_connection}
+        )
 
     def set_safe_height(self, head_pose_in_robot_space):
         # Define safe heights
@@ -703,8 +837,8 @@ class RobotControl:
 
         # Get current robot height
         robot_pose_z = self.robot_pose_storage.GetRobotPose()[2]
-        if robot_pose_z is None:
-            print("Warning: robot_pose_z is None — skipping height check.")
+        if math.isnan(robot_pose_z):
+            print("Warning: robot_pose_z is not available — skipping height check.")
             return max_safe_height
 
         # Determine the height to move to
@@ -715,6 +849,20 @@ class RobotControl:
 
         return move_to_height
 
+    def _halt_and_reset(self, warning):
+        print(warning)
+
+        # Stop the robot. This is done because if the head marker is not visible or the head is moving too fast, we
+        # cannot trust that the ongoing movement does not collide with the head.
+        self.stop_robot()
+
+        # Reset the state of the movement algorithm. This is done because the movement algorithm may have trouble
+        # resuming the state after the robot is stopped - this is the case for 'directly upward' algorithm - hence,
+        # it's better to continue from a known, well-defined state.
+        self.movement_algorithm.reset_state()
+
+        return True, warning
+
     def handle_objective_track_target(self):
         # If target has not been received, return early.
         if not self.target_set:
@@ -733,69 +881,62 @@ class RobotControl:
             print("Error: Transformation matrix from tracker to robot is not available")
             return False, ""
 
-        # Check if head is visible.
-        if (
-            self.head_pose_in_robot_space is None
-            or not self.tracker.head_visible
-            or not self.tracker.coil_visible
-        ):
-            if self.config["stop_robot_if_head_not_visible"]:
-                warning = "Warning: Head or coil marker is not visible"
-                print(warning)
-
-                # Stop the robot. This is done because if the head marker is not visible, we cannot trust that the ongoing
-                # movement does not collide with the head.
-                self.stop_robot()
-
-                # Reset the state of the movement algorithm. This is done because the movement algorithm may have trouble
-                # resuming the state after the robot is stopped - this is the case for 'directly upward' algorithm - hence,
-                # it's better to continue from a known, well-defined state.
-                self.movement_algorithm.reset_state()
-
-                return True, warning
-
+        # Check if the head and coil markers are visible, and that the head is not moving too fast. Both lead to the same
+        # stop path below.
+        #
+        # If the markers are not visible and the robot is to be stopped for that, do not update the head velocity
+        # estimate, as before; is_head_moving_too_fast records the pose on each call. For the same reason, only call
+        # it on the ticks that have a new tracker sample; the loop runs faster than the tracker, and repeated copies
+        # of the same pose would fill its window.
+        markers_visible = self.tracker.head_visible and self.tracker.coil_visible
+        stop_for_markers_not_visible = (
+            not markers_visible and self._stop_if_head_not_visible
+        )
+        if not markers_visible and not stop_for_markers_not_visible:
             print("Warning: Head marker is not visible")
 
-        # Check that the head is not moving too fast.
-        if self.process_tracker.is_head_moving_too_fast(self.head_pose_in_robot_space):
-            warning = "Warning: Head is moving too fast"
-            print(warning)
-            # Stop the robot. This is done because if the head is moving too fast, we cannot trust that the ongoing
-            # movement does not collide with the head.
-            self.stop_robot()
-
-            # Reset the state of the movement algorithm. This is done because the movement algorithm may have trouble
-            # resuming the state after the robot is stopped - this is the case for 'directly upward' algorithm - hence,
-            # it's better to continue from a known, well-defined state.
-            self.movement_algorithm.reset_state()
+        head_moving_too_fast = (
+            not stop_for_markers_not_visible
+            and self._new_tracker_sample
+            and self.process_tracker.is_head_moving_too_fast(
+                self.head_pose_in_robot_space, self._tick_now
+            )
+        )
 
-            return True, warning
+        if stop_for_markers_not_visible or head_moving_too_fast:
+            warning = (
+                "Warning: Head or coil marker is not visible"
+                if stop_for_markers_not_visible
+                else "Warning: Head is moving too fast"
+            )
+            return self._halt_and_reset(warning)
 
         # Check if the target is outside the working space. If so, return early.
-        if not self.target_pose_in_robot_space_estimated_from_displacement:
+        if self.target_pose_in_robot_space_estimated_from_displacement is None:
             return True, ""
-        working_space_radius = self.robot_config["working_space_radius"]
-        normalized_distance_to_target = np.linalg.norm(
-            self.target_pose_in_robot_space_estimated_from_displacement[:3]
-        )
-        if normalized_distance_to_target >= working_space_radius:
+
+        # Compare the squared distance with the squared radius; the square root is only needed for the warning.
+        p = self.target_pose_in_robot_space_estimated_from_displacement
+        squared_distance_to_target = p[0] * p[0] + p[1] * p[1] + p[2] * p[2]
+        if squared_distance_to_target >= self._working_space_radius_sq:
+            normalized_distance_to_target = math.sqrt(squared_distance_to_target)
             warning = f"Warning: Head is too far from the robot basis. Distance: {normalized_distance_to_target:.2f}"
             print(warning)
             return True, warning
 
         # Check if the robot is ready to move.
-        if self.robot_state_controller.get_state() != RobotState.READY:
+        if self.robot_state_controller.get_state() != _READY:
 
             # Return True even if the robot is not ready to move; the return value is used to indicate
             # that the robot is generally in a good state.
             return True, ""
 
         # Check if enough time has passed since the last tuning.
-        tuning_interval = self.config["tuning_interval"]
+        tuning_interval = self._tuning_interval
         if tuning_interval is not None:
             is_time_to_tune = (
                 self.last_tuning_time is not None
-                and time.time() - self.last_tuning_time > tuning_interval
+                and self._tick_now - self.last_tuning_time > tuning_interval
             )
         else:
             is_time_to_tune = False
@@ -812,10 +953,10 @@ class RobotControl:
             # that the robot is in a good state.
             return True, ""
 
-        self.last_tuning_time = time.time()
+        self.last_tuning_time = self._tick_now
 
         # Check if the displacement to the target is available.
-        if self.displacement_to_target is None:
+        if not self._have_displacement:
             print("Error: Displacement to target is not available")
 
             # Even though a recent displacement should be always available, it turns out that the 0.3 second time limit
@@ -823,18 +964,22 @@ class RobotControl:
             return True, ""
 
         # Ensure that the displacement to target has been updated recently.
-        if time.time() > self.last_displacement_update_time + 0.3:
+        if self._tick_now > self.last_displacement_update_time + 0.3:
             print("Error: No displacement update received for 0.3 seconds")
-            self.displacement_to_target = None
+            self._have_displacement = False
             return True, ""
 
         robot_pose = self.robot_pose_storage.GetRobotPose()
 
         # Move the robot.
-        print(
-            "Moving the robot based on the displacement:",
-            np.array(self.displacement_to_target),
-        )
+        #
+        # Only log the displacement if debug logging is enabled (see main_loop.py); the guard ensures that the
+        # displacement is not formatted otherwise.
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Moving the robot based on the displacement: %s",
+                self.displacement_to_target,
+            )
         success, normalize_force_sensor = self.movement_algorithm.move_decision(
             displacement_to_target=self.displacement_to_target,
             target_pose_in_robot_space_estimated_from_head_pose=self.target_pose_in_robot_space_estimated_from_head_pose,
@@ -852,7 +997,7 @@ class RobotControl:
 
             return False, warning
 
-        if self.config["use_pressure_sensor"] and not self.force_sensor.ready:
+        if self.use_pressure and not self.force_sensor.ready:
             warning = "Error: Pressure force sensor is not connected."
             print(warning)
             return False, warning
@@ -866,12 +1011,11 @@ class RobotControl:
     # Handle the movement away from the head.
 
     def handle_objective_move_away_from_head(self):
+        # The state does not change within this method before the checks below; read it only once.
+        state = self.robot_state_controller.get_state()
+
         # If the robot is not moving or starting to move, and we are in a state of moving away from the head, the movement is finished.
-        if (
-            self.moving_away_from_head
-            and self.robot_state_controller.get_state()
-            not in (RobotState.MOVING, RobotState.START_MOVING)
-        ):
+        if self.moving_away_from_head and state not in _MOVING_STATES:
 
             print("Finished movement away from head")
 
@@ -887,15 +1031,12 @@ class RobotControl:
             return True
 
         # If robot is still performing the previous movement, first stop that.
-        if self.robot_state_controller.get_state() in (
-            RobotState.MOVING,
-            RobotState.START_MOVING,
-        ):
+        if state in _MOVING_STATES:
             success = self.stop_robot()
             return success
 
         # If robot is not ready (e.g., it is still stopping the previous movement), return early.
-        if self.robot_state_controller.get_state() != RobotState.READY:
+        if state != _READY:
             return True
 
         # Otherwise, initiate the movement away from the head.
@@ -912,7 +1053,7 @@ class RobotControl:
         return success
 
     def handle_objective_none(self):
-        if self.robot_state_controller.get_state() != RobotState.MOVING:
+        if self.robot_state_controller.get_state() != _MOVING:
             return True
 
         print("No objective set, stopping the robot")
@@ -924,7 +1065,7 @@ class RobotControl:
 
     # Update the state variables.
 
-    def update_state_variables(self):
+    def update_state_variables(self, compute_poses_in_robot_space=True):
         """
         Updates the following state variables:
 
@@ -936,6 +1077,9 @@ class RobotControl:
 
         If they cannot be computed, set the corresponding state variable to None.
 
+        If compute_poses_in_robot_space is False, only the head pose in tracker space is filtered and the force
+        feedback is updated; the state variables in robot space are set to None.
+
         TODO: For now, store them in RobotControl object, but there would ideally be a better place for them.
         """
         if self.tracker.head_pose is None:
@@ -944,16 +1088,40 @@ class RobotControl:
             self.head_center = None
             self.target_pose_in_robot_space_estimated_from_head_pose = None
             self.target_pose_in_robot_space_estimated_from_displacement = None
+            self._new_tracker_sample = False
 
             return
 
-        head_pose_in_tracker_space_filtered = self.process_tracker.kalman_filter(
-            self.tracker.head_pose
-        )
+        # Only step the filter when a new tracker sample has been received; otherwise, use the previous filtered pose.
+        # The loop runs faster than the tracker, and stepping the filter with the same sample again would make it
+        # depend on the rate of the loop.
+        self._new_tracker_sample = self.tracker.version != self._tracker_version
+        if self._new_tracker_sample:
+            self._tracker_version = self.tracker.version
+            self._head_pose_filtered = self.process_tracker.kalman_filter(
+                self.tracker.head_pose
+            )
+        head_pose_in_tracker_space_filtered = self._head_pose_filtered
 
         if self.use_force:
             self.force_sensor.update_force_buffer()
 
+        # Keep filtering the head pose even if the poses in robot space are not needed, so that the filter state remains
+        # continuous.
+        if not compute_poses_in_robot_space:
+            self.head_pose_in_tracker_space_filtered = (
+                head_pose_in_tracker_space_filtered
+            )
+            self.head_pose_in_robot_space = None
+            self.head_center = None
+            self.target_pose_in_robot_space_estimated_from_head_pose = None
+            self.target_pose_in_robot_space_estimated_from_displacement = None
+
+            if self.m_target_to_head is not None:
+                self.update_force_feedback()
+
+            return
+
         if self.tracker.m_tracker_to_robot is not None:
             head_pose_in_robot_space = self.tracker.transform_pose_to_robot_space(
                 head_pose_in_tracker_space_filtered
@@ -993,6 +1161,9 @@ class RobotControl:
             )
         )
 
+        self.update_force_feedback()
+
+    def update_force_feedback(self):
         self.force_feedback = (
             self.get_pressure_sensor_values()
             if self.use_pressure
@@ -1003,10 +1174,13 @@ class RobotControl:
         self.send_warning_to_neuronavigation(warning)
         if self.use_force or self.use_pressure:
             self.send_force_sensor_data_to_neuronavigation(self.force_feedback)
-            if self.objective == RobotObjective.TRACK_TARGET:
+            if self.objective == _OBJECTIVE_TRACK_TARGET:
                 self.send_force_stability_to_neuronavigation(self.z_offset)
 
     def update(self):
+        # Read the clock once per tick; the handlers below use this instead of reading the clock themselves.
+        self._tick_now = _now()
+
         # Check if the robot is connected.
         if not self.robot.is_connected():
             print("Error: Robot is not connected")
@@ -1019,18 +1193,27 @@ class RobotControl:
         self.update_robot_pose()
 
         # Update the robot state.
-        self.robot_state_controller.update()
+        self.robot_state_controller.update(self._tick_now)
 
-        self.update_state_variables()
+        # When there is no objective and the robot is ready, the head and target poses in robot space are not used by
+        # anything; skip computing them. They are recomputed at the start of the first tick that has an objective,
+        # before the objective handlers read them.
+        #
+        # The robot pose is still updated above, as it is needed, e.g., when collecting calibration points.
+        is_idle = (
+            self.objective == _OBJECTIVE_NONE
+            and self.robot_state_controller.get_state() == _READY
+        )
+        self.update_state_variables(compute_poses_in_robot_space=not is_idle)
 
         warning = ""
-        if self.objective == RobotObjective.NONE:
+        if self.objective == _OBJECTIVE_NONE:
             success = self.handle_objective_none()
 
-        elif self.objective == RobotObjective.TRACK_TARGET:
+        elif self.objective == _OBJECTIVE_TRACK_TARGET:
             success, warning = self.handle_objective_track_target()
 
-        elif self.objective == RobotObjective.MOVE_AWAY_FROM_HEAD:
+        elif self.objective == _OBJECTIVE_MOVE_AWAY_FROM_HEAD:
             success = self.handle_objective_move_away_from_head()
 
         self.update_navigation_variables(warning)
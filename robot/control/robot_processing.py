@@ -1,8 +1,9 @@
 import time
 
-import cv2
 import numpy as np
 
+import robot.control._fast_kalman as fast_kalman
+import robot.control._fast_tf as fast_tf
 import robot.transformations as tr
 
 
@@ -241,20 +242,17 @@ def bezier_curve(points, step):
 class Transformation_matrix:
     def matrices_estimation(A, B):
         n = A.shape[2]
-        T = np.zeros([9, 9])
         X_est = np.eye(4)
         Y_est = np.eye(4)
 
         # Permutate A and B to get gross motions
         idx = np.random.permutation(n)
-        A = A[:, :, idx]
-        B = B[:, :, idx]
+        A = np.ascontiguousarray(A[:, :, idx], dtype=np.float64)
+        B = np.ascontiguousarray(B[:, :, idx], dtype=np.float64)
 
-        for ii in range(n - 1):
-            Ra = A[0:3, 0:3, ii]
-            Rb = B[0:3, 0:3, ii]
-            #  K[9*ii:9*(ii+1),:] = np.concatenate((np.kron(Rb,Ra), -np.eye(9)),axis=1)
-            T = T + np.kron(Rb, Ra)
+        # Sum of np.kron(Rb, Ra) over the first n - 1 motions, where Ra and Rb are the rotations of A and B.
+        #  K[9*ii:9*(ii+1),:] = np.concatenate((np.kron(Rb,Ra), -np.eye(9)),axis=1)
+        T = fast_tf.sum_rotation_kron(A, B, n - 1)
 
         U, S, Vt = np.linalg.svd(T)
         xp = Vt.T[:, 0]
@@ -270,19 +268,9 @@ class Transformation_matrix:
         U_yn, S_yn, Vt_yn = np.linalg.svd(Yn)
         Y = np.matmul(U_yn, Vt_yn)
 
-        A_est = np.zeros([3 * n, 6])
-        b_est = np.zeros([3 * n, 1])
-        for ii in range(n - 1):
-            A_est[3 * ii : 3 * ii + 3, :] = np.concatenate(
-                (-A[0:3, 0:3, ii], np.eye(3)), axis=1
-            )
-            b_est[3 * ii : 3 * ii + 3, :] = np.transpose(
-                A[0:3, 3, ii]
-                - np.matmul(
-                    np.kron(B[0:3, 3, ii].T, np.eye(3)),
-                    np.reshape(Y, (9, 1), order="F"),
-                ).T
-            )
+        # For each of the first n - 1 motions: [-Ra, I] @ [tx; ty] = ta - Y @ tb, where ta and tb are the
+        # translations of A and B. (Y @ tb equals np.kron(tb.T, np.eye(3)) @ np.reshape(Y, (9, 1), order="F").)
+        A_est, b_est = fast_tf.build_translation_system(A, B, Y, n - 1)
 
         t_est_np = np.linalg.lstsq(A_est, b_est, rcond=None)
         if t_est_np[2] < A_est.shape[1]:  # A_est.shape[1]=6
@@ -359,36 +347,35 @@ class KalmanTracker:
     """
     Kalman filter to avoid sudden fluctuation from tracker device.
     The filter strength can be set by the cov_process, and cov_measure parameter
-    It is required to create one instance for each variable (x, y, z, a, b, g)
+    Each variable (x, y, z, a, b, g) has its own filter; the filters for all variables are updated together in a
+    single call to the kernel in _fast_kalman.py.
     """
 
-    def __init__(self, state_num=2, covariance_process=0.001, covariance_measure=0.1):
-
-        self.state_num = state_num
-        measure_num = 1
-
-        # The filter itself.
-        self.filter = cv2.KalmanFilter(state_num, measure_num, 0)
+    def __init__(
+        self, num_variables=6, covariance_process=0.001, covariance_measure=0.1
+    ):
+        state_num = 2
 
-        self.state = np.zeros((state_num, 1), dtype=np.float32)
-        self.measurement = np.array((measure_num, 1), np.float32)
-        self.prediction = np.zeros((state_num, 1), np.float32)
+        # The states and the error covariances of the filters, one row for each variable; initially zero, as in
+        # cv2.KalmanFilter, which was used previously.
+        self.state = np.zeros((num_variables, state_num))
+        self.error_covariance = np.zeros((num_variables, state_num, state_num))
 
-        self.filter.transitionMatrix = np.array([[1, 1], [0, 1]], np.float32)
-        self.filter.measurementMatrix = np.array([[1, 1]], np.float32)
-        self.filter.processNoiseCov = (
-            np.array([[1, 0], [0, 1]], np.float32) * covariance_process
-        )
-        self.filter.measurementNoiseCov = (
-            np.array([[1]], np.float32) * covariance_measure
-        )
+        self.transition_matrix = np.array([[1.0, 1.0], [0.0, 1.0]])
+        self.measurement_matrix = np.array([1.0, 1.0])
+        self.process_noise_covariance = np.identity(state_num) * covariance_process
+        self.measurement_noise_covariance = float(covariance_measure)
 
     def update_kalman(self, measurement):
-        self.prediction = self.filter.predict()
-        self.measurement = np.array([[np.float32(measurement[0])]])
-
-        self.filter.correct(self.measurement)
-        self.state = self.filter.statePost
+        fast_kalman.kalman_step(
+            self.state,
+            self.error_covariance,
+            np.ascontiguousarray(measurement, dtype=np.float64),
+            self.transition_matrix,
+            self.process_noise_covariance,
+            self.measurement_matrix,
+            self.measurement_noise_covariance,
+        )
 
 
 class TrackerProcessing:
@@ -402,10 +389,9 @@ class TrackerProcessing:
         self.velocity_std = 0
         self.tracker_fiducials = 3 * [None]
 
-        self.tracker_stabilizers = [
-            KalmanTracker(state_num=2, covariance_process=0.001, covariance_measure=0.1)
-            for _ in range(6)
-        ]
+        self.tracker_stabilizer = KalmanTracker(
+            num_variables=6, covariance_process=0.001, covariance_measure=0.1
+        )
 
     def SetTrackerFiducials(self, tracker_fiducials):
         self.tracker_fiducials = tracker_fiducials
@@ -425,12 +411,10 @@ class TrackerProcessing:
                 print("  Nasion fiducial is not available")
 
     def kalman_filter(self, coord_tracker):
-        kalman_array = []
-        pose_np = np.array((coord_tracker[:3], coord_tracker[3:])).flatten()
-        for value, ps_stb in zip(pose_np, self.tracker_stabilizers):
-            ps_stb.update_kalman([value])
-            kalman_array.append(ps_stb.state[0])
-        coord_kalman = np.hstack(kalman_array)
+        self.tracker_stabilizer.update_kalman(coord_tracker)
+
+        # Copy the filtered pose out of the filter state, as the caller stores it as a state variable.
+        coord_kalman = self.tracker_stabilizer.state[:, 0].copy()
 
         self.kalman_coord_vector.append(coord_kalman[:3])
         if len(self.kalman_coord_vector) < 20:  # avoid initial fluctuations
@@ -440,12 +424,18 @@ class TrackerProcessing:
 
         return coord_kalman
 
-    def is_head_moving_too_fast(self, current_ref):
+    def is_head_moving_too_fast(self, current_ref, now=None):
         """
         Check if the head velocity is above the threshold. If yes, return True, otherwise False.
+
+        :param now: The time at which current_ref was sampled, as given by time.monotonic; read from the
+            clock if not given.
         """
+        if now is None:
+            now = time.monotonic()
+
         self.coord_vel.append(current_ref)
-        self.timestamps.append(time.time())
+        self.timestamps.append(now)
         if len(self.coord_vel) >= 10:
             head_velocity, head_distance = estimate_head_velocity(
                 self.coord_vel, self.timestamps
@@ -493,21 +483,19 @@ class TrackerProcessing:
         if m_tracker_to_robot is None:
             return None
 
-        m_head = compute_marker_transformation(
-            np.array([head_pose_in_tracker_space]), 0
+        m_head = coordinates_to_transformation_matrix(
+            position=head_pose_in_tracker_space[:3],
+            orientation=head_pose_in_tracker_space[3:],
+            axes="sxyz",
         )
 
-        m_ear_left_new = m_head @ m_probe_head_left
-        m_ear_right_new = m_head @ m_probe_head_right
-
         X, Y, affine = m_tracker_to_robot
-        m_ear_left_new_in_robot_space = affine @ m_ear_left_new
-        m_ear_right_new_in_robot_space = affine @ m_ear_right_new
 
-        center_head_in_robot_space = (
-            m_ear_left_new_in_robot_space[:3, -1]
-            + m_ear_right_new_in_robot_space[:3, -1]
-        ) / 2
+        # Only the translation column of affine @ m_head @ m_probe_head is needed, and the transformation is linear;
+        # hence, transform the midpoint of the ears as a single vector instead of multiplying the full matrices for
+        # both ears and averaging the results.
+        ears_midpoint = (m_probe_head_left[:, -1] + m_probe_head_right[:, -1]) / 2
+        center_head_in_robot_space = (affine @ (m_head @ ears_midpoint))[:3]
 
         return center_head_in_robot_space.tolist()
 
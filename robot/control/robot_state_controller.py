@@ -1,8 +1,11 @@
 import time
-from enum import Enum
+from enum import IntEnum
 
+# The waiting time is measured with the monotonic clock, which does not jump when the system time is adjusted.
+_now = time.monotonic
 
-class RobotState(Enum):
+
+class RobotState(IntEnum):
     READY = 0
     START_MOVING = 1
     MOVING = 2
@@ -11,6 +14,18 @@ class RobotState(Enum):
     WAITING_FOR_KEYPRESS = 5
 
 
+# Module-level aliases for the states, compared against on each update; avoids the attribute lookups on the enum class.
+_READY = RobotState.READY
+_START_MOVING = RobotState.START_MOVING
+_MOVING = RobotState.MOVING
+_WAITING = RobotState.WAITING
+_STOPPING = RobotState.STOPPING
+_WAITING_FOR_KEYPRESS = RobotState.WAITING_FOR_KEYPRESS
+
+# The states in which the motion state of the robot is needed in update.
+_MOTION_STATES = frozenset((_START_MOVING, _MOVING, _STOPPING))
+
+
 class RobotStateController:
     """
     The class for controlling the state of the robot.
@@ -25,6 +40,14 @@ class RobotStateController:
     - WAITING_FOR_KEYPRESS: The robot is waiting for a keypress to move back to READY.
     """
 
+    # Time (in seconds) after which the robot is inferred to have already finished the movement if it has been in
+    # START_MOVING without being detected to move. Previously measured as 10 updates of the main loop.
+    START_MOVING_TIMEOUT = 0.1
+
+    # Time (in seconds) to wait in STOPPING after the robot is first detected not to be moving, before going back to
+    # READY. Previously measured as 5 updates of the main loop (see START_MOVING_TIMEOUT).
+    STOPPING_SETTLE_TIME = 0.05
+
     def __init__(self, robot, config):
         self.robot = robot
 
@@ -47,7 +70,8 @@ class RobotStateController:
         )
         self.previous_state = None
 
-        self.not_moving_counter = 0
+        self.start_moving_time = None
+        self.stopped_time = None
 
         self.keypress = False
 
@@ -56,64 +80,79 @@ class RobotStateController:
     def keypress_detected(self):
         self.keypress = True
 
-    def update(self):
+    def update(self, now=None):
+        """
+        Update the state of the robot.
+
+        :param now: The current time, as given by time.monotonic; read from the clock if not given.
+        """
+        if now is None:
+            now = _now()
+
         self.previous_state = self.state
 
         stopped_moving = False
 
+        # Query the motion state from the robot only once per update, and only in the states in which it is needed;
+        # for some robots (e.g., Elfin), each query is a round-trip to the robot controller.
+        is_moving = self.robot.is_moving() if self.state in _MOTION_STATES else None
+
         # Check if the robot is starting to move
-        if self.state == RobotState.START_MOVING:
+        if self.state == _START_MOVING:
             # Check if the robot has started moving; if it has, change the state to MOVING.
-            if self.robot.is_moving():
-                self.state = RobotState.MOVING
+            if is_moving:
+                self.state = _MOVING
             else:
                 # Sometimes the robot movement may be over already before this 'update' method is called.
                 #
                 # Infer if that's the case by checking if the movement command has been issued (resulting in the
-                # robot being in the START_MOVING state) but the robot has not moved for a while.
-                self.not_moving_counter += 1
-                if self.not_moving_counter > 10:
+                # robot being in the START_MOVING state) but the robot has not moved for a while. The time is measured
+                # instead of counting the updates, so that the timeout does not depend on the rate of the main loop.
+                if now - self.start_moving_time > self.START_MOVING_TIMEOUT:
                     stopped_moving = True
 
         # Check if the robot was previously detected to be moving but is not moving anymore.
-        if self.state == RobotState.MOVING and not self.robot.is_moving():
+        if self.state == _MOVING and not is_moving:
             stopped_moving = True
 
         # If the robot has stopped moving, change the state to WAITING.
         if stopped_moving:
-            self.state = RobotState.WAITING
-            self.waiting_start_time = time.time()
+            self.state = _WAITING
+            self.waiting_start_time = now
 
         # If we are in WAITING, check if we have waited long enough.
-        if self.state == RobotState.WAITING:
-            waited_for = time.time() - self.waiting_start_time
+        if self.state == _WAITING:
+            waited_for = now - self.waiting_start_time
             self.remaining_dwell_time = self.dwell_time - waited_for
 
             # If we have waited long enough, go back to READY.
             if self.remaining_dwell_time <= 0:
                 self.state = (
-                    RobotState.READY
+                    _READY
                     if not self.wait_for_keypress_before_movement
-                    else RobotState.WAITING_FOR_KEYPRESS
+                    else _WAITING_FOR_KEYPRESS
                 )
 
         # If we are in STOPPING, check if we should go back to READY.
-        if self.state == RobotState.STOPPING and not self.robot.is_moving():
+        if self.state == _STOPPING and not is_moving:
             # XXX: At least Elfin's new version (using Linux) is not ready to receive a new movement
             #   command immediately when it reports not moving. This is a workaround to wait for a while
-            #   before going back to READY.
-            self.not_moving_counter += 1
-            if self.not_moving_counter > 5:
+            #   before going back to READY. As with START_MOVING_TIMEOUT, the time is measured instead of counting
+            #   the updates.
+            if self.stopped_time is None:
+                self.stopped_time = now
+
+            if now - self.stopped_time > self.STOPPING_SETTLE_TIME:
                 self.state = (
-                    RobotState.READY
+                    _READY
                     if not self.wait_for_keypress_before_movement
-                    else RobotState.WAITING_FOR_KEYPRESS
+                    else _WAITING_FOR_KEYPRESS
                 )
 
         # If we are in WAITING_FOR_KEYPRESS, check if a keypress has been detected; if so, set state to READY.
-        if self.state == RobotState.WAITING_FOR_KEYPRESS:
+        if self.state == _WAITING_FOR_KEYPRESS:
             if self.keypress:
-                self.state = RobotState.READY
+                self.state = _READY
                 self.keypress = False
 
         # Print the state if it has changed.
@@ -142,8 +181,8 @@ class RobotStateController:
             return
 
         self.state = RobotState.START_MOVING
-        self.not_moving_counter = 0
+        self.start_moving_time = _now()
 
     def set_state_to_stopping(self):
         self.state = RobotState.STOPPING
-        self.not_moving_counter = 0
+        self.stopped_time = None
@@ -0,0 +1,61 @@
+"""
+JSON module for encoding and decoding the Socket.IO packets exchanged with neuronavigation.
+
+Implements the subset of the standard library json interface used by python-socketio
+(dumps and loads), using orjson if it is installed and the standard library otherwise.
+
+orjson is stricter than the standard library: it does not accept NaN and Infinity, encodes them
+as null, and does not encode some values (e.g., integers larger than 64 bits). In these cases,
+the standard library is used instead, so that the output is the same as without orjson.
+"""
+
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    # Used by the standard library when falling back from orjson, which has already encoded NumPy values.
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(type(obj).__name__)
+    )
+
+
+def dumps(obj, **kwargs):
+    if orjson is None:
+        return json.dumps(obj, **kwargs)
+
+    try:
+        # orjson always produces compact output (i.e., ignores 'separators') and returns bytes.
+        s = orjson.dumps(
+            obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    except TypeError:
+        return json.dumps(obj, default=_default, **kwargs)
+
+    # orjson encodes NaN and Infinity as null; as null rarely appears in the packets, re-encode any
+    # packet containing it with the standard library, which keeps them.
+    if b"null" in s:
+        return json.dumps(obj, default=_default, **kwargs)
+
+    return s.decode("utf-8")
+
+
+def loads(s, **kwargs):
+    if orjson is None:
+        return json.loads(s, **kwargs)
+
+    try:
+        return orjson.loads(s)
+    except orjson.JSONDecodeError:
+        # E.g., NaN or Infinity, which the standard library accepts; if the packet is really malformed,
+        # the standard library raises the error instead.
+        return json.loads(s, **kwargs)
@@ -1,5 +1,6 @@
-from time import sleep
+from time import monotonic, sleep
 
+from robot.robots.elfin.elfin_comm_thread import ElfinCommThread
 from robot.robots.elfin.elfin_connection import (
     ElfinConnection,
     MotionState,
@@ -12,17 +13,31 @@ class Elfin(Robot):
     The class for communicating with Elfin robot.
     """
 
+    # Maximum time (in seconds) to wait for the robot to stop after the stop command, and the interval between
+    # the motion state queries while waiting.
+    STOP_TIMEOUT = 0.05
+    STOP_POLL_INTERVAL = 0.002
+
     def __init__(self, ip, use_new_api=False):
         self.connection = ElfinConnection(
             ip=ip,
             use_new_api=use_new_api,
         )
+        # Polls the robot state in the background, so that reading it does not block on a round-trip to the robot.
+        self.comm_thread = ElfinCommThread(
+            connection=self.connection,
+        )
 
     # Connection
     def connect(self):
-        return self.connection.connect()
+        success = self.connection.connect()
+        if success:
+            self.comm_thread.start()
+
+        return success
 
     def disconnect(self):
+        self.comm_thread.stop()
         return self.connection.disconnect()
 
     def is_connected(self):
@@ -33,17 +48,42 @@ class Elfin(Robot):
         pass
 
     # Robot state
+    #
+    # The pose, the motion state, and the force sensor values are read from the values cached by the
+    # communication thread; if not available yet, they are read from the robot directly.
     def get_pose(self):
-        return self.connection.get_pose()
+        cached = self.comm_thread.get_pose()
+        if cached is None:
+            return self.connection.get_pose()
+
+        # Return a copy, as the callers may modify the pose.
+        success, coordinates = cached
+        return success, coordinates[:] if coordinates is not None else None
 
     def is_moving(self):
-        return self.connection.get_motion_state() == MotionState.IN_MOTION
+        motion_state = self.comm_thread.get_motion_state()
+        if motion_state is None:
+            motion_state = self.connection.get_motion_state()
+
+        return motion_state == MotionState.IN_MOTION
 
     def is_error_state(self):
+        # Only checked when something has failed, hence query the robot directly to get the up-to-date state.
         return self.connection.get_motion_state() == MotionState.ERROR
 
     def read_force_sensor(self):
-        return self.connection.read_force_sensor()
+        # Start polling the force sensor in the communication thread once it is used.
+        self.comm_thread.poll_force_sensor = True
+
+        cached = self.comm_thread.get_force_sensor_values()
+        if cached is None:
+            return self.connection.read_force_sensor()
+
+        success, force_sensor_values = cached
+        if force_sensor_values is not None:
+            force_sensor_values = force_sensor_values[:]
+
+        return success, force_sensor_values
 
     # Movement
     def move_linear(self, target, speed_ratio):
@@ -59,7 +99,12 @@ class Elfin(Robot):
         # delays the main loop.
         sleep(0.1)
 
-        return self.connection.move_linear(target)
+        success = self.connection.move_linear(target)
+
+        # Poll the robot state at the fast rate while the robot executes the command.
+        self.comm_thread.wake()
+
+        return success
 
     def dynamic_motion(self, target, speed_ratio):
         success = self.connection.set_speed_ratio(speed_ratio)
@@ -67,7 +112,10 @@ class Elfin(Robot):
             return False
 
         # Using moveB
-        return self.connection.move_linear(target)
+        success = self.connection.move_linear(target)
+        self.comm_thread.wake()
+
+        return success
 
     def move_circular(self, start_position, waypoint, target, speed_ratio):
         success = self.connection.set_speed_ratio(speed_ratio)
@@ -82,13 +130,24 @@ class Elfin(Robot):
         # delays the main loop.
         sleep(0.1)
 
-        return self.connection.move_circular(start_position, waypoint, target)
+        success = self.connection.move_circular(start_position, waypoint, target)
+        self.comm_thread.wake()
+
+        return success
 
     def stop_robot(self):
         success = self.connection.stop_robot()
-
-        # After the stop command, it takes some milliseconds for the robot to stop. Wait for that time.
-        sleep(0.05)
+        self.comm_thread.wake()
+
+        # After the stop command, it takes some milliseconds for the robot to stop. Wait until the robot reports
+        # that it is no longer moving, but at most for the time that was previously always waited. Query the
+        # robot directly, as the cached motion state may predate the stop command.
+        deadline = monotonic() + self.STOP_TIMEOUT
+        while (
+            monotonic() < deadline
+            and self.connection.get_motion_state() == MotionState.IN_MOTION
+        ):
+            sleep(self.STOP_POLL_INTERVAL)
 
         return success
 
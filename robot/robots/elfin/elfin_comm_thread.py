@@ -0,0 +1,195 @@
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from robot.robots.elfin.elfin_connection import MotionState
+
+
+class ElfinCommThread:
+    # Interval (in seconds) between two consecutive polls of the robot state while the robot is moving, or has
+    # recently been commanded to move (see wake).
+    POLL_INTERVAL = 0.005
+
+    # Interval (in seconds) between two consecutive polls while the robot is idle. The pose does not change while
+    # the robot is not moving, and each poll holds the connection lock, delaying the commands from the control loop.
+    IDLE_POLL_INTERVAL = 0.05
+
+    # Time (in seconds) after a call to wake during which the robot state is polled at POLL_INTERVAL, even if the
+    # robot is not reported to be moving yet.
+    WAKE_DURATION = 0.5
+
+    # Maximum age (in seconds) of a cached value; older values are not returned, so that the callers read the
+    # robot directly instead of using a stale value. Must be longer than IDLE_POLL_INTERVAL.
+    MAX_SAMPLE_AGE = 0.1
+
+    def __init__(self, connection):
+        """
+        Class for periodically polling the Elfin robot state in a background thread.
+
+        The latest pose, motion state, and (once requested) force sensor values are cached, so that the
+        control loop can read them without waiting for a round-trip to the robot. The requests are sent
+        through the given ElfinConnection, which serializes them with the movement commands sent from
+        the control loop.
+        """
+        self.connection = connection
+
+        self.lock = Lock()
+
+        # The cached values, as returned by the corresponding ElfinConnection methods, as pairs of the time
+        # (as given by time.monotonic) when the value was read and the value; None if not available.
+        self.pose = None
+        self.motion_state = None
+        self.force_sensor_values = None
+
+        # Reading the force sensor is an extra round-trip on each poll; only poll it once it has been requested.
+        self.poll_force_sensor = False
+
+        # Set when a poll has failed, so that the error is printed only once until a poll succeeds again.
+        self.poll_failed = False
+
+        # Poll at POLL_INTERVAL until this time (as given by time.monotonic); set by wake.
+        self.wake_until = 0.0
+
+        # Incremented by wake; a motion state read by a poll that started before the latest wake may predate
+        # the command, hence it is not cached.
+        self.wake_count = 0
+
+        self.stop_event = Event()
+        self.wake_event = Event()
+        self.worker_thread = None
+
+    def start(self):
+        if self.worker_thread is not None and self.worker_thread.is_alive():
+            return
+
+        self.stop_event.clear()
+
+        self.worker_thread = Thread(target=self.run, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+        if self.worker_thread:
+            self.worker_thread.join()
+            self.worker_thread = None
+
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.pose = None
+            self.motion_state = None
+            self.force_sensor_values = None
+
+    def wake(self):
+        """
+        Notify that a command affecting the motion of the robot has been sent. Invalidates the cached motion state,
+        as it may predate the command, and polls the robot state immediately and then at POLL_INTERVAL.
+        """
+        with self.lock:
+            self.motion_state = None
+            self.wake_count += 1
+            self.wake_until = monotonic() + self.WAKE_DURATION
+
+        self.wake_event.set()
+
+    def _get_cached(self, sample):
+        """
+        Return the value of a cached sample, or None if the sample is not available, is too old, or the
+        thread is not running anymore.
+        """
+        if sample is None:
+            return None
+
+        if self.worker_thread is None or not self.worker_thread.is_alive():
+            return None
+
+        sample_time, value = sample
+        if monotonic() - sample_time > self.MAX_SAMPLE_AGE:
+            return None
+
+        return value
+
+    def get_pose(self):
+        with self.lock:
+            sample = self.pose
+        return self._get_cached(sample)
+
+    def get_motion_state(self):
+        with self.lock:
+            sample = self.motion_state
+        return self._get_cached(sample)
+
+    def get_force_sensor_values(self):
+        with self.lock:
+            sample = self.force_sensor_values
+        return self._get_cached(sample)
+
+    def poll(self):
+        """
+        Read the robot state and update the cached values.
+
+        :return: True if the robot is idle, i.e., not moving and not recently woken up; otherwise False.
+        """
+        with self.lock:
+            wake_count = self.wake_count
+
+        pose = self.connection.get_pose()
+        pose_time = monotonic()
+
+        motion_state = self.connection.get_motion_state()
+        motion_state_time = monotonic()
+
+        force_sensor_values = None
+        if self.poll_force_sensor:
+            force_sensor_values = self.connection.read_force_sensor()
+            force_sensor_values = monotonic(), force_sensor_values
+
+        with self.lock:
+            self.pose = pose_time, pose
+            self.motion_state = (
+                (motion_state_time, motion_state)
+                if wake_count == self.wake_count
+                else None
+            )
+            self.force_sensor_values = force_sensor_values
+
+            is_idle = (
+                motion_state != MotionState.IN_MOTION and monotonic() > self.wake_until
+            )
+
+        return is_idle
+
+    def run(self):
+        while not self.stop_event.is_set():
+            # If the connection has been lost, do not serve stale values; wait for the connection to be re-established.
+            if not self.connection.connected:
+                self.clear()
+                self._wait(self.POLL_INTERVAL)
+                continue
+
+            is_idle = False
+
+            # Do not let an unexpected error (e.g., a malformed response from the robot) terminate the thread; clear
+            # the cached values instead, so that the callers read the robot directly until polling succeeds again.
+            try:
+                is_idle = self.poll()
+
+                if self.poll_failed:
+                    print("Polling the robot state succeeded again")
+                    self.poll_failed = False
+
+            except Exception as e:
+                self.clear()
+
+                if not self.poll_failed:
+                    print("Error: Could not poll the robot state: {}".format(e))
+                    self.poll_failed = True
+
+            self._wait(self.IDLE_POLL_INTERVAL if is_idle else self.POLL_INTERVAL)
+
+    def _wait(self, timeout):
+        # Wait until the timeout, or until woken up by wake or stop.
+        self.wake_event.wait(timeout)
+        self.wake_event.clear()
@@ -1,6 +1,7 @@
 import time
 from enum import Enum
 from socket import AF_INET, SOCK_STREAM, socket
+from threading import Lock
 
 
 class MotionState(Enum):
@@ -22,6 +23,10 @@ class ElfinConnection:
     RESPONSE_LENGTH = 1024
     ROBOT_ID = 0
 
+    # Minimum interval (in seconds) between two prints of the same error message. The robot state is polled
+    # frequently (see ElfinCommThread), and a persistent failure would otherwise flood the output.
+    ERROR_MESSAGE_INTERVAL = 1.0
+
     def __init__(self, ip, use_new_api):
         """
         Class for low-level communication with Elfin robot.
@@ -35,6 +40,33 @@ class ElfinConnection:
         self.connected = False
         self.socket = None
 
+        # The protocol is request-response over a single socket; the lock ensures that requests sent from
+        # different threads (the control loop and ElfinCommThread) do not interleave.
+        self.lock = Lock()
+
+        # The time (as given by time.monotonic) when each error message was last printed.
+        self.error_message_times = {}
+
+    def print_error(self, message):
+        """
+        Print an error message, unless the same message has been printed within ERROR_MESSAGE_INTERVAL.
+        """
+        now = time.monotonic()
+
+        last_printed = self.error_message_times.get(message)
+        if (
+            last_printed is not None
+            and now - last_printed < self.ERROR_MESSAGE_INTERVAL
+        ):
+            return
+
+        # The messages may contain values received from the robot; avoid growing the dictionary indefinitely.
+        if len(self.error_message_times) > 100:
+            self.error_message_times.clear()
+
+        self.error_message_times[message] = now
+        print(message)
+
     def connect(self):
         """
         Connects to the robot.
@@ -84,13 +116,17 @@ class ElfinConnection:
 
         full_request = request + self.REQUEST_ENDING_CHARS
         try:
-            # Send the request to the robot.
-            self.socket.sendall(full_request.encode("utf-8"))
+            with self.lock:
+                # Send the request to the robot.
+                self.socket.sendall(full_request.encode("utf-8"))
 
-            # Receive the response from the robot.
-            response = self.socket.recv(self.RESPONSE_LENGTH).decode("utf-8").split(",")
+                # Receive the response from the robot.
+                response = (
+                    self.socket.recv(self.RESPONSE_LENGTH).decode("utf-8").split(",")
+                )
 
-        except (BrokenPipeError, ConnectionResetError, TimeoutError) as e:
+        except OSError as e:
+            # Includes BrokenPipeError, ConnectionResetError, and TimeoutError, as well as other socket errors.
             print("Robot connection error: {}".format(e))
             self.connected = False
             return False, None
@@ -98,6 +134,18 @@ class ElfinConnection:
         if verbose:
             print("Done.")
 
+        # An empty response means that the robot has closed the connection; a truncated one does not contain
+        # the command, the status, and the error code.
+        if len(response) < 3:
+            if response == [""]:
+                print("Robot connection error: the connection was closed by the robot")
+                self.connected = False
+            else:
+                self.print_error(
+                    "Invalid response from the robot: {}".format(",".join(response))
+                )
+            return False, None
+
         # Process the response.
         command = response[0]
         status = response[1]
@@ -107,13 +155,13 @@ class ElfinConnection:
             success = True
 
         elif status == "Fail":
-            print(
+            self.print_error(
                 "The command {} returned the error code: {}".format(command, error_code)
             )
             success = False
 
         else:
-            print("Unknown status")
+            self.print_error("Unknown status")
             success = False
 
         # XXX: Params returned by Elfin start from element 2 if the command was
@@ -302,7 +350,7 @@ class ElfinConnection:
         success, params = self._send_and_receive(request)
 
         if not success or params is None:
-            print("Could not read robot motion state")
+            self.print_error("Could not read robot motion state")
             return MotionState.ERROR
 
         if self.use_new_api:
@@ -327,7 +375,7 @@ class ElfinConnection:
             elif code == 1025:
                 return MotionState.ERROR
             else:
-                print("Unknown motion state: {}".format(code))
+                self.print_error("Unknown motion state: {}".format(code))
                 return MotionState.UNKNOWN
 
     def move_circular(self, start_position, waypoint, target):
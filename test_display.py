@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+# Use a non-interactive backend, as the tests do not open the PointOfApp window.
+os.environ.setdefault("MPL_BACKEND", "Agg")
+
+import display  # noqa: E402
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+    return str(path)
+
+
+def test_read_last_line_of_empty_file(tmp_path):
+    file = write(tmp_path / "tmp", "")
+
+    assert display.read_last_line(file) is None
+
+
+def test_read_last_line_with_trailing_newline(tmp_path):
+    file = write(tmp_path / "tmp", "[1.0, 2.0]\n[3.0, 4.0]\n")
+
+    assert display.read_last_line(file) == "[3.0, 4.0]"
+
+
+def test_read_last_line_without_trailing_newline(tmp_path):
+    file = write(tmp_path / "tmp", "[1.0, 2.0]\n[3.0, 4.0]")
+
+    assert display.read_last_line(file) == "[3.0, 4.0]"
+
+
+def test_read_last_line_of_single_line(tmp_path):
+    file = write(tmp_path / "tmp", "[1.5, -2.0]\n")
+
+    assert display.parse_point(display.read_last_line(file)) == (1.5, -2.0)
+
+
+def test_partial_last_line_is_not_parsed(tmp_path):
+    file = write(tmp_path / "tmp", "[1.0, 2.0]\n[3.0, 4.")
+
+    line = display.read_last_line(file)
+    assert line == "[3.0, 4."
+
+    with pytest.raises(ValueError):
+        display.parse_point(line)
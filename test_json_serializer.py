@@ -0,0 +1,52 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from robot import json_serializer
+
+
+def test_round_trip_with_nan_and_infinity():
+    s = json_serializer.dumps(
+        {"pose": [1.0, float("nan"), float("inf"), -float("inf")]}
+    )
+    pose = json_serializer.loads(s)["pose"]
+
+    assert pose[0] == 1.0
+    assert math.isnan(pose[1])
+    assert pose[2] == float("inf")
+    assert pose[3] == -float("inf")
+
+
+def test_round_trip_with_nan_in_numpy_array():
+    s = json_serializer.dumps({"pose": np.array([1.0, np.nan])})
+    pose = json_serializer.loads(s)["pose"]
+
+    assert pose[0] == 1.0
+    assert math.isnan(pose[1])
+
+
+def test_loads_nan_and_infinity_from_standard_library():
+    s = json.dumps([float("nan"), float("inf")])
+    values = json_serializer.loads(s)
+
+    assert math.isnan(values[0])
+    assert values[1] == float("inf")
+
+
+def test_dumps_int_keys():
+    assert json.loads(json_serializer.dumps({1: "a"})) == {"1": "a"}
+
+
+def test_dumps_none():
+    assert json_serializer.loads(json_serializer.dumps({"a": None})) == {"a": None}
+
+
+def test_dumps_large_int():
+    assert json_serializer.loads(json_serializer.dumps([2**70])) == [2**70]
+
+
+def test_loads_malformed_packet_raises():
+    with pytest.raises(ValueError):
+        json_serializer.loads('{"a": ')